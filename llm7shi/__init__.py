@@ -25,16 +25,18 @@ __name__ = "llm7shi"
 from importlib.metadata import version
 __version__ = version("llm7shi")
 
-# Import main functions for convenience
-from .gemini import (
-    DEFAULT_MODEL,
-    build_schema_from_json,
-    config_from_schema,
-    config_text,
-    generate_content_retry,
-    upload_file,
-    delete_file,
-)
+# Gemini functions are re-exported lazily (see __getattr__ below) because
+# gemini.py imports google-genai, which is slow to load and not needed by
+# users of the other providers.
+_GEMINI_EXPORTS = frozenset({
+    "DEFAULT_MODEL",
+    "build_schema_from_json",
+    "config_from_schema",
+    "config_text",
+    "generate_content_retry",
+    "upload_file",
+    "delete_file",
+})
 
 from .response import Response
 
@@ -50,6 +52,7 @@ from .utils import (
     add_additional_properties_false,
     inline_defs,
     extract_descriptions,
+    prepare_schema,
     create_json_descriptions_prompt,
     is_openai_messages,
     openai_messages_to_contents,
@@ -82,6 +85,7 @@ __all__ = [
     "add_additional_properties_false",
     "inline_defs",
     "extract_descriptions",
+    "prepare_schema",
     "create_json_descriptions_prompt",
     "is_openai_messages",
     "openai_messages_to_contents",
@@ -90,3 +94,16 @@ __all__ = [
     "StreamProcessor",
     "detect_repetition",
 ]
+
+
+def __getattr__(name):
+    if name in _GEMINI_EXPORTS:
+        from . import gemini
+        value = getattr(gemini, name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | _GEMINI_EXPORTS)
@@ -1,11 +1,13 @@
+import copy
 import json
 import sys
 import inspect
 import re
+from functools import lru_cache
 from typing import Dict, Any, List, Union, Type
 from pydantic import BaseModel
 
-from .utils import contents_to_openai_messages, add_additional_properties_false, do_show_params, inline_defs
+from .utils import contents_to_openai_messages, add_additional_properties_false, do_show_params, prepare_schema
 from .response import Response
 from .terminal import MarkdownStreamConverter
 from .monitor import StreamMonitor
@@ -54,6 +56,7 @@ def generate_with_schema(
     show_params: bool = True,
     max_length=None,
     check_repetition: bool = True,
+    keep_chunks: bool = False,
 ) -> Response:
     """Generate content using OpenAI, Gemini, or Ollama API.
 
@@ -69,6 +72,7 @@ def generate_with_schema(
         show_params: Whether to display parameters before generation
         max_length: Maximum length of generated text (default: None, no limit)
         check_repetition: Whether to check for repetitive patterns (default: True)
+        keep_chunks: Whether to retain raw streaming chunks in Response.chunks (default: False)
 
     Returns:
         Response: Response object containing generated text and metadata
@@ -111,14 +115,14 @@ def generate_with_schema(
         if vendor_prefix == "openrouter":
             extra_body = {"reasoning": {"enabled": include_thoughts}}
 
-        return _generate_with_openai(actual_model, contents, schema, temperature, system_prompt, file, show_params, max_length, check_repetition, extra_body=extra_body)
+        return _generate_with_openai(actual_model, contents, schema, temperature, system_prompt, file, show_params, max_length, check_repetition, extra_body=extra_body, keep_chunks=keep_chunks)
 
     elif vendor_prefix == "google":
-        return _generate_with_gemini(actual_model, contents, schema, temperature, system_prompt, include_thoughts, thinking_budget, file, show_params, max_length, check_repetition)
+        return _generate_with_gemini(actual_model, contents, schema, temperature, system_prompt, include_thoughts, thinking_budget, file, show_params, max_length, check_repetition, keep_chunks=keep_chunks)
     elif vendor_prefix == "openai":
-        return _generate_with_openai(actual_model, contents, schema, temperature, system_prompt, file, show_params, max_length, check_repetition)
+        return _generate_with_openai(actual_model, contents, schema, temperature, system_prompt, file, show_params, max_length, check_repetition, keep_chunks=keep_chunks)
     elif vendor_prefix == "ollama":
-        return _generate_with_ollama(actual_model, contents, schema, temperature, system_prompt, include_thoughts, file, show_params, max_length, check_repetition)
+        return _generate_with_ollama(actual_model, contents, schema, temperature, system_prompt, include_thoughts, file, show_params, max_length, check_repetition, keep_chunks=keep_chunks)
     else:
         raise ValueError(f"Unsupported vendor prefix: {vendor_prefix}")
 
@@ -135,6 +139,7 @@ def _generate_with_gemini(
     show_params: bool = True,
     max_length=None,
     check_repetition: bool = True,
+    keep_chunks: bool = False,
 ) -> Response:
     """Generate with Gemini API."""
     from . import config_from_schema, generate_content_retry, config_text, DEFAULT_MODEL
@@ -184,13 +189,36 @@ def _generate_with_gemini(
         thinking_budget=thinking_budget,
         file=file,
         max_length=max_length,
-        check_repetition=check_repetition
+        check_repetition=check_repetition,
+        keep_chunks=keep_chunks,
     )
 
     # Return Response object
     return result
 
 
+@lru_cache(maxsize=128)
+def _model_json_schema(model: Type[BaseModel]) -> Dict[str, Any]:
+    """Return the JSON schema of a Pydantic model class, generated once per class.
+
+    The result is shared between calls; callers must deep-copy it before
+    handing it out.
+    """
+    return model.model_json_schema()
+
+
+@lru_cache(maxsize=128)
+def _openai_model_schema(model: Type[BaseModel]) -> Dict[str, Any]:
+    """Return the OpenAI-ready schema for a Pydantic model class.
+
+    $defs references are inlined and objects closed in a single pass. Model
+    classes are long-lived and their generated schema is fixed, so the result
+    is computed once per class and shared; callers must deep-copy it before
+    handing it out.
+    """
+    return prepare_schema(_model_json_schema(model))
+
+
 def _generate_with_openai(
     model: str,
     contents: MessageContent,
@@ -202,6 +230,7 @@ def _generate_with_openai(
     max_length=None,
     check_repetition: bool = True,
     extra_body=None,
+    keep_chunks: bool = False,
 ) -> Response:
     """Generate with OpenAI API with streaming."""
     from .openai import DEFAULT_MODEL, generate_content
@@ -222,13 +251,13 @@ def _generate_with_openai(
     kwargs = {}
     
     if schema is not None:
-        # Convert Pydantic model to JSON schema
         if inspect.isclass(schema) and issubclass(schema, BaseModel):
-            schema = schema.model_json_schema()
-            schema = inline_defs(schema)  # Inline $defs references
-        
-        # Adjust JSON schema
-        schema_for_openai = add_additional_properties_false(schema)
+            # Convert Pydantic model to JSON schema (cached per model class);
+            # the copy ends up in Response.config, so callers may modify it
+            schema_for_openai = copy.deepcopy(_openai_model_schema(schema))
+        else:
+            # Adjust JSON schema
+            schema_for_openai = add_additional_properties_false(schema)
         
         kwargs["response_format"] = {
             "type": "json_schema",
@@ -262,6 +291,7 @@ def _generate_with_openai(
         check_repetition=check_repetition,
         base_url=base_url,
         api_key_env=api_key_env,
+        keep_chunks=keep_chunks,
         **kwargs
     )
 
@@ -277,6 +307,7 @@ def _generate_with_ollama(
     show_params: bool = True,
     max_length=None,
     check_repetition: bool = True,
+    keep_chunks: bool = False,
 ) -> Response:
     """Generate with Ollama API with streaming."""
     from .ollama import DEFAULT_MODEL, generate_content
@@ -285,9 +316,10 @@ def _generate_with_ollama(
     kwargs = {}
     
     if schema is not None:
-        # Convert Pydantic model to JSON schema
+        # Convert Pydantic model to JSON schema (cached per model class);
+        # the copy ends up in Response.config, so callers may modify it
         if inspect.isclass(schema) and issubclass(schema, BaseModel):
-            schema = schema.model_json_schema()
+            schema = copy.deepcopy(_model_json_schema(schema))
         
         kwargs["format"] = schema
     
@@ -309,5 +341,6 @@ def _generate_with_ollama(
         file=file,
         max_length=max_length,
         check_repetition=check_repetition,
+        keep_chunks=keep_chunks,
         **kwargs
     )
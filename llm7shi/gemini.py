@@ -123,6 +123,7 @@ def generate_content_retry(
     show_params=True,
     max_length=None,
     check_repetition=True,
+    keep_chunks=False,
 ):
     """Generate content with retry logic and return a Response object.
     
@@ -136,6 +137,7 @@ def generate_content_retry(
         show_params: Whether to display parameters before generation (default: False)
         max_length: Maximum length of generated text (default: None, no limit)
         check_repetition: Whether to check for repetitive patterns every 1KB (default: True)
+        keep_chunks: Whether to retain raw streaming chunks in Response.chunks (default: False)
     
     Returns:
         Response: Object containing thoughts, text, response, and chunks
@@ -172,36 +174,42 @@ def generate_content_retry(
             
             # Initialize response tracking variables
             processor = StreamProcessor(file=file, max_length=max_length, check_repetition=check_repetition)
-            chunks = []  # Collect all chunks
+            chunks = [] if keep_chunks else None  # Raw chunks only when requested
             stop = False  # Set when monitoring requests early termination
 
-            # Process streaming response chunks
-            for chunk in response:
-                chunks.append(chunk)
-                if hasattr(chunk, "candidates") and chunk.candidates and chunk.candidates[0].content and chunk.candidates[0].content.parts:
-                    for part in chunk.candidates[0].content.parts:
-                        if not part.text:
-                            continue
-                        elif part.thought:
-                            # Handle thinking process output.
-                            # Some models (e.g. Gemma) keep emitting thought
-                            # parts even with include_thoughts=False; suppress
-                            # them here instead of leaking them into the answer.
-                            if include_thoughts and not processor.add_thought(part.text):
+            try:
+                # Process streaming response chunks
+                for chunk in response:
+                    if chunks is not None:
+                        chunks.append(chunk)
+                    if hasattr(chunk, "candidates") and chunk.candidates and chunk.candidates[0].content and chunk.candidates[0].content.parts:
+                        for part in chunk.candidates[0].content.parts:
+                            if not part.text:
+                                continue
+                            elif part.thought:
+                                # Handle thinking process output.
+                                # Some models (e.g. Gemma) keep emitting thought
+                                # parts even with include_thoughts=False; suppress
+                                # them here instead of leaking them into the answer.
+                                if include_thoughts and not processor.add_thought(part.text):
+                                    stop = True
+                                    break
+                            else:
+                                # Handle final answer output
+                                if not processor.add_text(part.text):
+                                    stop = True
+                                    break
+                    else:
+                        # Fallback for older API response format
+                        if hasattr(chunk, "text") and chunk.text:
+                            if not processor.add_text(chunk.text):
                                 stop = True
-                                break
-                        else:
-                            # Handle final answer output
-                            if not processor.add_text(part.text):
-                                stop = True
-                                break
-                else:
-                    # Fallback for older API response format
-                    if hasattr(chunk, "text") and chunk.text:
-                        if not processor.add_text(chunk.text):
-                            stop = True
-                if stop:
-                    break
+                    if stop:
+                        break
+            except BaseException:
+                # Show held partial output before the retry message
+                processor.abort()
+                raise
 
             processor.finalize()
 
@@ -210,7 +218,7 @@ def generate_content_retry(
                 config=config,
                 contents=contents,
                 response=response,
-                chunks=chunks,
+                chunks=chunks or [],
                 thoughts=processor.thoughts,
                 text=processor.text,
                 repetition=processor.repetition_detected,
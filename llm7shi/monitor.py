@@ -7,25 +7,20 @@ Whitespace detection uses weighted calculation:
 - Threshold: 512 weighted units
 """
 import sys
+import time
 from typing import Optional
 from math import ceil
 import re
 
 from .terminal import MarkdownStreamConverter
 
-# Lookup table for required repetitions (pattern_len 1-20)
-# Generated dynamically by _initialize_required_reps_table()
-_REQUIRED_REPS_TABLE = {}
-
-
-def _initialize_required_reps_table():
-    """Initialize the required repetitions lookup table using dynamic base algorithm.
+def _build_required_reps_table() -> tuple:
+    """Build the required repetitions lookup table using dynamic base algorithm.
 
     Uses base=340 with monotonic non-decreasing constraint to generate
-    required repetitions for pattern lengths 1-20.
+    required repetitions for pattern lengths 1-20. Index 0 is unused.
     """
-    global _REQUIRED_REPS_TABLE
-
+    table = [0]
     base = 340
     prev_total = 0
 
@@ -39,11 +34,17 @@ def _initialize_required_reps_table():
             required_reps = ceil(total / pattern_len)
             total = required_reps * pattern_len
 
-        _REQUIRED_REPS_TABLE[pattern_len] = required_reps
+        table.append(required_reps)
 
         base = total
         prev_total = total
 
+    return tuple(table)
+
+
+# Lookup table for required repetitions (pattern_len 1-20), built at import
+_REQUIRED_REPS_TABLE = _build_required_reps_table()
+
 
 def _calculate_required_reps(pattern_len: int) -> int:
     """Calculate required repetitions for a given pattern length.
@@ -57,10 +58,6 @@ def _calculate_required_reps(pattern_len: int) -> int:
     Returns:
         int: Number of repetitions required for this pattern length
     """
-    # Initialize table on first use
-    if not _REQUIRED_REPS_TABLE:
-        _initialize_required_reps_table()
-
     # For patterns >= 21 characters, use fixed repetition count
     if pattern_len >= 21:
         return 20
@@ -103,8 +100,11 @@ def _check_quasi_repetition(text: str, pattern: str, required_reps: int) -> bool
     pos = text_len - pattern_len
 
     while reps < required_reps and pos > 0:
-        # Use rfind to find the previous occurrence of the pattern
-        prev_pos = text.rfind(pattern, 0, pos)
+        # Use rfind to find the previous occurrence of the pattern.
+        # Only occurrences with a gap shorter than the pattern can continue
+        # the chain, so the search window is bounded to 2 * pattern_len
+        # characters instead of scanning back to the start of the text.
+        prev_pos = text.rfind(pattern, max(pos - 2 * pattern_len + 1, 0), pos)
 
         if prev_pos == -1:
             # No more occurrences found
@@ -143,17 +143,20 @@ def detect_repetition(text: str, threshold: Optional[int] = None) -> bool:
     Returns:
         bool: True if repetition detected, False otherwise
     """
+    text_len = len(text)
+
     # Set default threshold based on text length
     if threshold is None:
-        threshold = len(text) // 10
+        threshold = text_len // 10
 
     # Phase 1: Check patterns from 1 to 10 characters
+    # (pattern_len <= 10 always hits the lookup table directly)
+    reps_table = _REQUIRED_REPS_TABLE
     for pattern_len in range(1, min(10, threshold) + 1):
-        # Calculate required repetitions
-        required_reps = _calculate_required_reps(pattern_len)
+        required_reps = reps_table[pattern_len]
 
         # Break early if text is too short based on pattern length
-        if pattern_len * required_reps > len(text):
+        if pattern_len * required_reps > text_len:
             break
 
         # Extract pattern from the end
@@ -172,20 +175,29 @@ def detect_repetition(text: str, threshold: Optional[int] = None) -> bool:
     suffix_marker = text[-10:]  # Last 10 characters as a marker
 
     # Find all occurrences of suffix_marker and check patterns
-    search_end = len(text) - 10
+    search_end = text_len - 10
     min_search_pos = max(search_end - threshold, 0)
     while True:
-        pos = text[:search_end].rfind(suffix_marker)
+        # Search within bounds rather than slicing a copy of the prefix;
+        # occurrences before min_search_pos would be rejected anyway
+        pos = text.rfind(suffix_marker, min_search_pos, search_end)
 
         # Stop if we've gone beyond the threshold limit
         if pos < min_search_pos:
             break
 
+        # Candidates only grow as the search moves back, and the characters
+        # needed (pattern_len * required_reps) never decrease with length,
+        # so once one cannot fit in the text no later candidate can either
+        candidate_len = text_len - pos - 10
+        required_reps = _calculate_required_reps(candidate_len)
+        if candidate_len * required_reps > text_len:
+            break
+
         # Extract the candidate pattern from this position to end
         candidate_pattern = text[pos + 10:]
 
         # Check for exact or quasi-repetition
-        required_reps = _calculate_required_reps(len(candidate_pattern))
         if _check_quasi_repetition(text, candidate_pattern, required_reps):
             return True
 
@@ -209,6 +221,11 @@ def _calculate_trailing_whitespace_weight(text: str) -> int:
     Returns:
         int: Total weighted count of trailing whitespace
     """
+    # Most checks land on text that does not end in whitespace; isspace()
+    # matches what rstrip() removes, so skip the strip in that case
+    if not text or not text[-1].isspace():
+        return 0
+
     stripped_len = len(text.rstrip())
     diff = len(text) - stripped_len
 
@@ -299,9 +316,57 @@ class StreamMonitor:
         return True
 
 
+class TokenWriter:
+    """Batches streamed display output to avoid a flush per token.
+
+    Fragments are buffered and written with a single write()/flush() when a
+    newline arrives, enough characters accumulate, or enough time has passed
+    since the last flush, so fast streams produce one flush per line while
+    slow streams still appear token by token.
+    """
+
+    def __init__(self, file, max_chars=256, max_delay=0.05):
+        """Initialize the writer.
+
+        Args:
+            file: Output file to write to
+            max_chars: Buffered character count that forces a flush
+            max_delay: Seconds since the last flush that force a flush
+        """
+        self.file = file
+        self.max_chars = max_chars
+        self.max_delay = max_delay
+        self._buffer = []
+        self._size = 0
+        self._last_flush = time.monotonic()
+
+    def write(self, s: str) -> None:
+        """Buffer a fragment, flushing on newline, size, or elapsed time."""
+        self._buffer.append(s)
+        self._size += len(s)
+        if ("\n" in s or self._size >= self.max_chars
+                or time.monotonic() - self._last_flush >= self.max_delay):
+            self.flush()
+
+    def flush(self) -> None:
+        """Write out all buffered fragments and flush the underlying file."""
+        if self._buffer:
+            self.file.write("".join(self._buffer))
+            self._buffer.clear()
+            self._size = 0
+        self.file.flush()
+        self._last_flush = time.monotonic()
+
+
 THINKING_HEADER = "🤔 **Thinking...**\n"
 ANSWER_HEADER = "\n💡 **Answer:**\n"
 
+# Converted headers for a converter with no open formatting (see _emit_header)
+_CONVERTED_HEADERS = {
+    header: MarkdownStreamConverter().feed(header)
+    for header in (THINKING_HEADER, ANSWER_HEADER)
+}
+
 
 class StreamProcessor:
     """Manages the thinking/answer display state machine shared by all providers.
@@ -330,6 +395,8 @@ class StreamProcessor:
         """
         self.converter = MarkdownStreamConverter()
         self.file = file
+        # Monitor warnings also go through the writer so they stay in order
+        self._writer = TokenWriter(file) if file else None
         self.thoughts = ""  # Raw server thoughts (verbatim)
         self.text = ""      # Raw server answer text (verbatim)
         self._thoughts_shown = False
@@ -360,7 +427,7 @@ class StreamProcessor:
             self._thoughts_shown = True
         self.thoughts += chunk  # Store verbatim
         self._emit_stream(chunk)
-        return self._thoughts_monitor.check(self.thoughts, self.file)
+        return self._thoughts_monitor.check(self.thoughts, self._writer)
 
     def add_text(self, chunk: str) -> bool:
         """Accumulate and display an answer chunk.
@@ -379,7 +446,7 @@ class StreamProcessor:
             self._answer_shown = True
         self.text += chunk  # Store verbatim
         self._emit_stream(chunk)
-        return self._answer_monitor.check(self.text, self.file)
+        return self._answer_monitor.check(self.text, self._writer)
 
     def finalize(self) -> None:
         """Flush any buffered display output and ensure a single trailing newline."""
@@ -390,8 +457,22 @@ class StreamProcessor:
         # Match the providers' "ensure trailing newline" behavior (and emit one for
         # empty output, where _last_char is still "").
         if self.file and self._last_char != "\n":
-            print(flush=True, file=self.file)
-            self._last_char = "\n"
+            self._write("\n")
+        if self._writer:
+            self._writer.flush()
+
+    def abort(self) -> None:
+        """Show buffered display output after the provider stream raised.
+
+        Unlike finalize(), no trailing newline is added, and a failing file
+        (e.g. the error being handled is a broken pipe) is ignored so that it
+        cannot replace the exception being propagated.
+        """
+        if self._writer:
+            try:
+                self._writer.flush()
+            except Exception:
+                pass
 
     @property
     def repetition_detected(self) -> bool:
@@ -405,18 +486,29 @@ class StreamProcessor:
         return self._answer_monitor.max_length_exceeded
 
     def _write(self, s: str) -> None:
-        """Print already-converted output and track the last displayed character."""
+        """Write already-converted output and track the last displayed character."""
         if not s or not self.file:
             return
-        print(s, end="", flush=True, file=self.file)
+        self._writer.write(s)
         self._last_char = s[-1]
 
     def _emit_header(self, header: str) -> None:
         """Display a section header (reproduces ``print(converter.feed(header))``)."""
         if self.file:
+            converter = self.converter
+            if (header in _CONVERTED_HEADERS and not converter.buffer
+                    and not converter.stack and not converter.code_block):
+                # Clean converter state: the output is known in advance, and the
+                # balanced markers leave only the line state to update
+                converted = _CONVERTED_HEADERS[header]
+                converter.line_has_content = False
+            else:
+                converted = converter.feed(header)
             # The trailing "\n" matches print()'s default line ending in the original
             # provider code, leaving one blank line after the header.
-            self._write(self.converter.feed(header) + "\n")
+            self._write(converted + "\n")
+            # Section boundaries are always shown immediately
+            self._writer.flush()
 
     def _emit_stream(self, chunk: str) -> None:
         """Display a content chunk, holding back trailing newlines (blank lines).
@@ -430,9 +522,13 @@ class StreamProcessor:
         """
         if not self.file:
             return
-        data = self._held + chunk
-        body = data.rstrip("\n")
-        self._held = data[len(body):]
+        if self._held or chunk[-1] == "\n":
+            data = self._held + chunk
+            body = data.rstrip("\n")
+            self._held = data[len(body):]
+        else:
+            # Common case: nothing held and no trailing newline to hold back
+            body = chunk
         if self._leading:
             body = body.lstrip("\n")  # display-only: drop leading blank lines
             if body:
@@ -464,8 +560,8 @@ class GptOssTemplateFilter:
 
     def __init__(self):
         """Initialize the filter."""
-        self.thoughts = ""
-        self.text = ""
+        self._thoughts_parts = []  # Analysis channel fragments (joined on demand)
+        self._text_parts = []      # Final channel fragments (joined on demand)
         self.buffer = ""
         self.channel = None  # None, 'analysis', or 'final'
         self.expecting_channel_name = False  # True after <|channel|> token
@@ -479,6 +575,23 @@ class GptOssTemplateFilter:
             '<|end|>',
         ]
 
+    @property
+    def thoughts(self) -> str:
+        """All analysis channel content received so far."""
+        return self._joined(self._thoughts_parts)
+
+    @property
+    def text(self) -> str:
+        """All final channel content received so far."""
+        return self._joined(self._text_parts)
+
+    @staticmethod
+    def _joined(parts: list) -> str:
+        """Join accumulated fragments, collapsing them so repeated reads stay cheap."""
+        if len(parts) > 1:
+            parts[:] = ["".join(parts)]
+        return parts[0] if parts else ""
+
     def feed(self, content: str) -> str:
         """Process content and extract thoughts/text based on channels.
 
@@ -488,7 +601,22 @@ class GptOssTemplateFilter:
         Returns:
             str: Filtered content for display (final channel only)
         """
+        return self.feed_delta(content)[1]
+
+    def feed_delta(self, content: str) -> tuple[str, str]:
+        """Process content and return the fragments it added to each channel.
+
+        Lets streaming callers forward new content directly instead of diffing
+        ``thoughts``/``text`` against previously seen lengths.
+
+        Args:
+            content: Raw content chunk from stream
+
+        Returns:
+            tuple[str, str]: Newly appended (thoughts, text), possibly empty strings
+        """
         self.buffer += content
+        thoughts = ""
         output = ""
 
         # Process buffer to detect control tokens and channel switches
@@ -576,16 +704,16 @@ class GptOssTemplateFilter:
 
             # Route to appropriate channel
             if self.channel == 'analysis':
-                self.thoughts += content_chunk
-            elif self.channel == 'final':
-                self.text += content_chunk
-                output += content_chunk
+                thoughts += content_chunk
             else:
-                # No channel set, assume it's final text
-                self.text += content_chunk
+                # Final channel, or no channel set (assume it's final text)
                 output += content_chunk
 
-        return output
+        if thoughts:
+            self._thoughts_parts.append(thoughts)
+        if output:
+            self._text_parts.append(output)
+        return thoughts, output
 
     def flush(self) -> str:
         """Flush any remaining buffer content.
@@ -593,13 +721,22 @@ class GptOssTemplateFilter:
         Returns:
             str: Any remaining filtered content
         """
+        return self.flush_delta()[1]
+
+    def flush_delta(self) -> tuple[str, str]:
+        """Flush any remaining buffer content and return what it added.
+
+        Returns:
+            tuple[str, str]: Residual (thoughts, text), possibly empty strings
+        """
+        thoughts = ""
+        output = ""
         if self.buffer:
-            output = ""
             if self.channel == 'final' or self.channel is None:
-                self.text += self.buffer
+                self._text_parts.append(self.buffer)
                 output = self.buffer
             elif self.channel == 'analysis':
-                self.thoughts += self.buffer
+                self._thoughts_parts.append(self.buffer)
+                thoughts = self.buffer
             self.buffer = ""
-            return output
-        return ""
+        return thoughts, output
@@ -14,9 +14,14 @@ def generate_content(
     file=sys.stdout,
     max_length=None,
     check_repetition: bool = True,
+    keep_chunks: bool = False,
     **kwargs
 ) -> Response:
-    """Generate with Ollama API with streaming and monitoring."""
+    """Generate with Ollama API with streaming and monitoring.
+
+    Raw streaming chunks are retained in Response.chunks only when
+    keep_chunks=True.
+    """
     client = ollama.Client()
     
     # Use default model if not provided
@@ -39,24 +44,30 @@ def generate_content(
         **kwargs
     )
     
-    # Collect streamed response and chunks
-    chunks = []
+    # Collect streamed response (raw chunks only when requested)
+    chunks = [] if keep_chunks else None
     processor = StreamProcessor(file=file, max_length=max_length, check_repetition=check_repetition)
 
-    for chunk in response:
-        chunks.append(chunk)
+    try:
+        for chunk in response:
+            if chunks is not None:
+                chunks.append(chunk)
 
-        # Handle thinking content
-        if getattr(chunk.message, 'thinking', None) is not None:
-            if not processor.add_thought(chunk.message.thinking):
-                client._client.close()
-                break
+            # Handle thinking content
+            if getattr(chunk.message, 'thinking', None) is not None:
+                if not processor.add_thought(chunk.message.thinking):
+                    client._client.close()
+                    break
 
-        # Handle regular content
-        if chunk.message.content:
-            if not processor.add_text(chunk.message.content):
-                client._client.close()
-                break
+            # Handle regular content
+            if chunk.message.content:
+                if not processor.add_text(chunk.message.content):
+                    client._client.close()
+                    break
+    except BaseException:
+        # Show held partial output before the error propagates
+        processor.abort()
+        raise
 
     processor.finalize()
 
@@ -66,7 +77,7 @@ def generate_content(
         config=kwargs,
         contents=messages,
         response=response,
-        chunks=chunks,
+        chunks=chunks or [],
         thoughts=processor.thoughts,
         text=processor.text,
         repetition=processor.repetition_detected,
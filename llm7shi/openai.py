@@ -1,6 +1,7 @@
 import sys
 import os
-from typing import List, Dict, Any
+from functools import lru_cache
+from typing import List, Dict, Any, Optional
 from openai import OpenAI
 
 from .response import Response
@@ -8,6 +9,32 @@ from .monitor import StreamProcessor, GptOssTemplateFilter
 
 DEFAULT_MODEL = "gpt-4.1-mini"
 
+# Environment variables the OpenAI SDK reads when a client is constructed
+# (API keys are resolved separately and passed explicitly)
+_CLIENT_ENV_VARS = (
+    "OPENAI_BASE_URL",
+    "OPENAI_ORG_ID",
+    "OPENAI_PROJECT_ID",
+    "OPENAI_CUSTOM_HEADERS",
+    "OPENAI_WEBHOOK_SECRET",
+    "OPENAI_ADMIN_KEY",
+)
+
+
+@lru_cache(maxsize=8)
+def _get_client(base_url: Optional[str], api_key: Optional[str], env: tuple) -> OpenAI:
+    """Return a process-local client shared per (base_url, api_key, env).
+
+    Reusing the client keeps its HTTP connection pool (keep-alive and TLS
+    sessions) warm across calls. `env` holds the current values of
+    _CLIENT_ENV_VARS; it only serves as part of the cache key, so a changed
+    SDK setting (e.g. OPENAI_BASE_URL) gets a new client instead of a stale
+    one. Construct OpenAI() directly when a fresh, unshared client is needed.
+    """
+    if base_url is None and api_key is None:
+        return OpenAI()
+    return OpenAI(base_url=base_url, api_key=api_key)
+
 
 def generate_content(
     messages: List[Dict[str, Any]],
@@ -17,6 +44,7 @@ def generate_content(
     check_repetition: bool = True,
     base_url: str = None,
     api_key_env: str = None,
+    keep_chunks: bool = False,
     **kwargs
 ) -> Response:
     """Generate with OpenAI API with streaming and monitoring.
@@ -31,6 +59,7 @@ def generate_content(
         api_key_env: Environment variable name containing API key.
                      If None and base_url is specified, api_key will be set to ""
                      to prevent leaking OPENAI_API_KEY to untrusted servers.
+        keep_chunks: Whether to retain raw streaming chunks in Response.chunks
         **kwargs: Additional arguments for OpenAI API
     """
 
@@ -49,15 +78,15 @@ def generate_content(
     if api_key_env is not None:
         # Use specified environment variable
         api_key = os.environ.get(api_key_env, "")
-        client = OpenAI(base_url=base_url, api_key=api_key)
     elif base_url is not None:
         # base_url specified but api_key_env is None: use empty string for security
         # This prevents leaking OPENAI_API_KEY to untrusted local servers
-        client = OpenAI(base_url=base_url, api_key="")
+        api_key = ""
     else:
-        # No base_url, no api_key_env: use default OpenAI client
-        # (will automatically use OPENAI_API_KEY environment variable)
-        client = OpenAI()
+        # No base_url, no api_key_env: use default OpenAI behavior
+        # (OPENAI_API_KEY, resolved here so a changed key gets its own client)
+        api_key = os.environ.get("OPENAI_API_KEY")
+    client = _get_client(base_url, api_key, tuple(map(os.environ.get, _CLIENT_ENV_VARS)))
 
     # Call API with streaming
     response = client.chat.completions.create(
@@ -67,65 +96,50 @@ def generate_content(
         **kwargs
     )
 
-    # Collect streamed response and chunks
-    chunks = []
+    # Collect streamed response (raw chunks only when requested)
+    chunks = [] if keep_chunks else None
     content_filter = GptOssTemplateFilter() if needs_gpt_oss_filter else None
     processor = StreamProcessor(file=file, max_length=max_length, check_repetition=check_repetition)
 
-    # Track previous lengths for incremental display (gpt-oss filter only)
-    previous_thoughts_len = 0
-    previous_text_len = 0
-
-    for chunk in response:
-        chunks.append(chunk)
-        delta = chunk.choices[0].delta
-
-        # Handle reasoning content (OpenRouter / reasoning models expose delta.reasoning)
-        reasoning = getattr(delta, "reasoning", None)
-        if reasoning:
-            if not processor.add_thought(reasoning):
-                response.close()
-                break
-
-        if delta.content is not None:
+    # Bind hot methods to locals once; the loop below runs per streamed token
+    chunks_append = chunks.append if keep_chunks else None
+    add_thought = processor.add_thought
+    add_text = processor.add_text
+    filter_feed = content_filter.feed_delta if content_filter else None
+
+    try:
+        for chunk in response:
+            if chunks_append:
+                chunks_append(chunk)
+            delta = chunk.choices[0].delta
             content = delta.content
 
-            # Apply filter if present
-            if content_filter:
-                content_filter.feed(content)
+            # Handle reasoning content (OpenRouter / reasoning models expose delta.reasoning)
+            reasoning = getattr(delta, "reasoning", None)
+            if reasoning:
+                if not add_thought(reasoning):
+                    response.close()
+                    break
 
-                # Output incremental thoughts (analysis channel)
-                if len(content_filter.thoughts) > previous_thoughts_len:
-                    new_thoughts = content_filter.thoughts[previous_thoughts_len:]
-                    previous_thoughts_len = len(content_filter.thoughts)
-                    if not processor.add_thought(new_thoughts):
+            if content is not None:
+                # Apply filter if present
+                if filter_feed:
+                    if not _forward_filtered(filter_feed(content), add_thought, add_text):
                         response.close()
                         break
-
-                # Output incremental text (final channel)
-                if len(content_filter.text) > previous_text_len:
-                    new_text = content_filter.text[previous_text_len:]
-                    previous_text_len = len(content_filter.text)
-                    if not processor.add_text(new_text):
-                        response.close()
+                else:
+                    # No filter: direct passthrough
+                    if not add_text(content):
+                        response.close()  # Close stream connection
                         break
-            else:
-                # No filter: direct passthrough
-                if not processor.add_text(content):
-                    response.close()  # Close stream connection
-                    break
-
-    # Flush filter if present
-    if content_filter:
-        content_filter.flush()
 
-        # Output any remaining thoughts
-        if len(content_filter.thoughts) > previous_thoughts_len:
-            processor.add_thought(content_filter.thoughts[previous_thoughts_len:])
-
-        # Output any remaining text
-        if len(content_filter.text) > previous_text_len:
-            processor.add_text(content_filter.text[previous_text_len:])
+        # Flush filter if present
+        if content_filter:
+            _forward_filtered(content_filter.flush_delta(), add_thought, add_text)
+    except BaseException:
+        # Show held partial output before the error propagates
+        processor.abort()
+        raise
 
     processor.finalize()
 
@@ -135,9 +149,26 @@ def generate_content(
         config=kwargs,
         contents=messages,
         response=response,
-        chunks=chunks,
+        chunks=chunks or [],
         thoughts=processor.thoughts,
         text=processor.text,
         repetition=processor.repetition_detected,
         max_length=processor.max_length_exceeded,
     )
+
+
+def _forward_filtered(delta, add_thought, add_text) -> bool:
+    """Forward a filter's (thoughts, text) delta to the stream processor.
+
+    Thoughts (analysis channel) are sent before text (final channel), and
+    forwarding stops as soon as the processor requests early termination.
+
+    Returns:
+        bool: True if generation should continue, False if it should stop
+    """
+    new_thoughts, new_text = delta
+    if new_thoughts and not add_thought(new_thoughts):
+        return False
+    if new_text and not add_text(new_text):
+        return False
+    return True
@@ -3,7 +3,7 @@ from dataclasses import dataclass, field
 from typing import List, Optional, Any
 
 
-@dataclass
+@dataclass(slots=True, repr=False, eq=False)
 class Response:
     """Response object containing the results from LLM API calls.
     
@@ -12,7 +12,7 @@ class Response:
         config: The configuration object used (provider-specific)
         contents: The input contents sent to the API
         response: The raw API response object
-        chunks: List of all streaming chunks received
+        chunks: List of all streaming chunks received (empty unless keep_chunks=True)
         thoughts: The thinking process text (if include_thoughts=True)
         text: The final generated text
         repetition: Whether repetitive patterns were detected during generation
@@ -36,13 +36,21 @@ class Response:
         """Return a concise representation showing contents and text."""
         if self.contents is None:
             contents_repr = "None"
+        elif not self.contents:
+            contents_repr = ""
         else:
-            contents_repr = str(self.contents[0])
-            if len(contents_repr) > 10:
-                contents_repr = contents_repr[:10] + "..."
-        
-        text_repr = self.text
-        if len(text_repr) > 10:
-            text_repr = text_repr[:10] + "..."
-        
-        return f"Response(contents={contents_repr!r}, text={text_repr!r})"
+            first = self.contents[0]
+            if isinstance(first, dict):
+                # Truncate the message text instead of formatting the whole dict
+                first = first.get("content") or first.get("text") or ""
+            if not isinstance(first, str):
+                # e.g. a list of content parts
+                first = str(first)
+            contents_repr = _truncate(first)
+
+        return f"Response(contents={contents_repr!r}, text={_truncate(self.text)!r})"
+
+
+def _truncate(s: str, limit: int = 10) -> str:
+    """Shorten a string for display, appending "..." when truncated."""
+    return s[:limit] + "..." if len(s) > limit else s
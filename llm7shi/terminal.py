@@ -80,8 +80,12 @@ def convert_markdown(text):
     line (whitespace-only) or end of text resets it.
     """
     result = ""
-    # Normalize line endings to Unix style (LF)
-    text = text.replace("\r\n", "\n").replace("\r", "\n")
+    # Normalize line endings to Unix style (LF); LLM output rarely has "\r"
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    # Fast path: without markers there is nothing to convert
+    if "*" not in text and "`" not in text:
+        return text
     stack = []           # active inline formats (**bold**, inline `code`)
     line_has_content = False  # non-whitespace seen on the current line
     code_block = False   # inside a ``` fenced block
@@ -263,6 +267,18 @@ class MarkdownStreamConverter:
         # Combine buffered text with new chunk
         text = self.buffer + chunk
         self.buffer = ""
+
+        # Fast path: without markers, outside a code block, the text passes
+        # through unchanged unless a blank line would close active formatting
+        if ("*" not in text and "`" not in text and not self.code_block
+                and (not self.stack or "\n" not in text)):
+            last_nl = text.rfind("\n")
+            if text[last_nl + 1:].strip(" \t"):
+                self.line_has_content = True
+            elif last_nl >= 0:
+                self.line_has_content = False
+            return text
+
         n = len(text)
 
         while i < n:
@@ -1,6 +1,7 @@
 import json
 import sys
 import inspect
+from functools import lru_cache
 from typing import Dict, Any, List, Union, Type
 
 from pydantic import BaseModel
@@ -25,27 +26,34 @@ def do_show_params(contents, *, model=None, file=sys.stdout, **kwargs):
     # Find the maximum key length for alignment
     max_key_len = max(len(k) for k in params.keys()) if params else 0
 
-    # Print parameters with aligned colons
-    for k, v in params.items():
-        print(f"- {k:<{max_key_len}}: {v}", file=file)
+    # Build the whole output and write it at once instead of printing per line;
+    # the alignment width is baked into one format string up front
+    line_format = f"- {{:<{max_key_len}}}: {{}}\n"
+    parts = [line_format.format(k, v) for k, v in params.items()]
 
     # Display contents based on format
     if contents and isinstance(contents[0], dict):
         # OpenAI message format
         for msg in contents:
-            print(file=file)
             role = msg.get("role", "unknown")
             content = msg.get("content", "")
-            print(f"> [{role}]", file=file)
-            for line in content.splitlines():
-                print(">", line, file=file)
+            parts.append(f"\n> [{role}]\n")
+            parts.append(_quote_lines(content))
     else:
         # Legacy List[str] format - quote each line of contents
         for content in contents:
-            print(file=file)
-            for line in content.splitlines():
-                print(">", line, file=file)
-    print(file=file)
+            parts.append("\n")
+            parts.append(_quote_lines(content))
+    parts.append("\n")
+    file.write("".join(parts))
+
+
+def _quote_lines(text: str) -> str:
+    """Prefix every line of text with "> " using a single join."""
+    lines = text.splitlines()
+    if not lines:
+        return ""
+    return "> " + "\n> ".join(lines) + "\n"
 
 
 def contents_to_openai_messages(
@@ -69,59 +77,66 @@ def contents_to_openai_messages(
         # Already in OpenAI format
         if system_prompt:
             # Check for conflict with message-embedded system prompt
-            system_messages = [msg for msg in contents if msg["role"] == "system"]
-            if system_messages:
+            if any(msg["role"] == "system" for msg in contents):
                 raise ValueError(
                     "System prompt provided in both messages (role='system') and system_prompt parameter. "
                     "Please use only one method."
                 )
             # Add system_prompt to the beginning
-            openai_messages = [{"role": "system", "content": system_prompt}]
-            openai_messages.extend(contents)
-            return openai_messages
+            return [{"role": "system", "content": system_prompt}, *contents]
         else:
             # Return contents as-is
             return contents
     else:
-        # Legacy List[str] format
-        openai_messages = []
-
-        if system_prompt:
-            openai_messages.append({"role": "system", "content": system_prompt})
-
-        for content in contents:
-            openai_messages.append({"role": "user", "content": content})
-
+        # Legacy List[str] format, built in one pass (system prompt first,
+        # rather than inserted afterwards and shifting every message)
+        openai_messages = [{"role": "system", "content": system_prompt}] if system_prompt else []
+        openai_messages.extend({"role": "user", "content": content} for content in contents)
         return openai_messages
 
 
 def add_additional_properties_false(schema: Dict[str, Any]) -> Dict[str, Any]:
     """Add additionalProperties: false to schema for OpenAI compatibility."""
-    def process_schema(obj: Any) -> Any:
-        if isinstance(obj, dict):
-            obj = obj.copy()
-            
-            # Add additionalProperties: false to objects
-            if obj.get("type") == "object":
-                obj["additionalProperties"] = False
-            
-            # Recursively process all nested schemas
-            for key, value in obj.items():
-                if key == "properties" and isinstance(value, dict):
-                    # Process each property
-                    obj[key] = {k: process_schema(v) for k, v in value.items()}
-                elif key == "items":
-                    # Process array items
-                    obj[key] = process_schema(value)
-                elif isinstance(value, dict):
-                    # Process any other nested dict
-                    obj[key] = process_schema(value)
-            
-            return obj
-        else:
-            return obj
-    
-    return process_schema(schema)
+    if not isinstance(schema, dict):
+        return schema
+
+    # Iterative traversal: each stacked container is already a copy whose
+    # nested schemas are replaced in place by their own (stacked) copies
+    result = schema.copy()
+    stack = [result]
+    while stack:
+        obj = stack.pop()
+
+        if isinstance(obj, list):
+            # Process list branches (anyOf, oneOf, allOf, prefixItems, ...)
+            for i, item in enumerate(obj):
+                if isinstance(item, (dict, list)):
+                    item = item.copy()
+                    stack.append(item)
+                    obj[i] = item
+            continue
+
+        # Add additionalProperties: false to objects
+        if obj.get("type") == "object":
+            obj["additionalProperties"] = False
+
+        for key, value in obj.items():
+            if key == "properties" and isinstance(value, dict):
+                # Process each property (non-container values are kept by the copy)
+                properties = value.copy()
+                for k, v in value.items():
+                    if isinstance(v, (dict, list)):
+                        v = v.copy()
+                        stack.append(v)
+                        properties[k] = v
+                obj[key] = properties
+            elif isinstance(value, (dict, list)):
+                # Process array items, list branches and any other nesting
+                value = value.copy()
+                stack.append(value)
+                obj[key] = value
+
+    return result
 
 
 def inline_defs(schema: Dict[str, Any]) -> Dict[str, Any]:
@@ -138,29 +153,65 @@ def inline_defs(schema: Dict[str, Any]) -> Dict[str, Any]:
     """
     schema = schema.copy()
     defs = schema.pop("$defs", {})
-    
-    def resolve_ref(obj: Any, seen_defs: set) -> Any:
+
+    # Iterative traversal: each entry fills slot `key` of `parent` with the
+    # resolved form of `obj`; `seen_defs` holds the definitions on this path
+    root = [None]
+    stack = [(root, 0, schema, frozenset())]
+    while stack:
+        parent, key, obj, seen_defs = stack.pop()
+
+        # Follow $ref chains, tracking definitions seen on this path
+        while isinstance(obj, dict) and "$ref" in obj:
+            ref = obj["$ref"]
+            if not ref.startswith("#/$defs/"):
+                break
+            def_name = ref[8:]
+            if def_name in seen_defs:
+                # Cycle detected, raise an error
+                raise ValueError(f"Circular reference detected in schema: {def_name}")
+            if def_name not in defs:
+                break
+            seen_defs = seen_defs | {def_name}
+            obj = defs[def_name]
+
         if isinstance(obj, dict):
-            if "$ref" in obj:
-                ref = obj["$ref"]
-                if ref.startswith("#/$defs/"):
-                    def_name = ref[8:]
-                    if def_name in seen_defs:
-                        # Cycle detected, raise an error
-                        raise ValueError(f"Circular reference detected in schema: {def_name}")
-                    if def_name in defs:
-                        # Add current def to seen set for this path and recurse
-                        return resolve_ref(defs[def_name], seen_defs | {def_name})
-            
-            # Recursively resolve in all values, excluding 'title'
-            return {k: resolve_ref(v, seen_defs) for k, v in obj.items() if k != "title"}
+            # Resolve all values, excluding 'title' (placeholders keep key
+            # order); scalar leaves are copied directly instead of stacked
+            out = {}
+            for k, v in obj.items():
+                if k == "title":
+                    continue
+                if k == "properties" and isinstance(v, dict):
+                    # Property names are not keywords: a property called
+                    # "title" is kept, only its schema is resolved
+                    properties = v.copy()
+                    for prop_key, prop_value in v.items():
+                        if isinstance(prop_value, (dict, list)):
+                            stack.append((properties, prop_key, prop_value, seen_defs))
+                    out[k] = properties
+                else:
+                    out[k] = v
+                    if isinstance(v, (dict, list)):
+                        stack.append((out, k, v, seen_defs))
+            parent[key] = out
         elif isinstance(obj, list):
-            return [resolve_ref(item, seen_defs) for item in obj]
+            out = obj.copy()
+            for i, item in enumerate(obj):
+                if isinstance(item, (dict, list)):
+                    stack.append((out, i, item, seen_defs))
+            parent[key] = out
         else:
-            return obj
-    
-    # Start resolution with an empty set of seen definitions
-    return resolve_ref(schema, set())
+            parent[key] = obj
+
+    return root[0]
+
+
+# Sentinel for optional dictionary lookups
+_MISSING = object()
+
+# Keys extract_descriptions handles explicitly rather than as generic nesting
+_DESCRIPTION_SKIP_KEYS = frozenset({"properties", "items", "description"})
 
 
 def extract_descriptions(schema: Dict[str, Any]) -> Dict[str, str]:
@@ -173,36 +224,126 @@ def extract_descriptions(schema: Dict[str, Any]) -> Dict[str, str]:
         Dictionary mapping parent keys to their description values
     """
     descriptions = {}
-    
-    def traverse_schema(obj: Any, parent_key: str = None) -> None:
+
+    # Iterative pre-order traversal; children are pushed in reverse so they
+    # are visited (and descriptions recorded) in document order
+    stack = [(schema, None)]
+    while stack:
+        obj, parent_key = stack.pop()
         if isinstance(obj, dict):
             # If this object has a description and we have a parent key
-            if "description" in obj and parent_key:
-                descriptions[parent_key] = obj["description"]
-            
-            # Traverse properties
-            if "properties" in obj and isinstance(obj["properties"], dict):
-                for prop_key, prop_value in obj["properties"].items():
-                    traverse_schema(prop_value, prop_key)
-            
+            if parent_key:
+                description = obj.get("description", _MISSING)
+                if description is not _MISSING:
+                    descriptions[parent_key] = description
+
+            children = []
+
+            # Traverse properties (scalar values cannot hold descriptions)
+            properties = obj.get("properties")
+            if isinstance(properties, dict):
+                for k, v in properties.items():
+                    if isinstance(v, (dict, list)):
+                        children.append((v, k))
+
             # Handle array items separately - don't pass parent_key to avoid overwriting
-            if "items" in obj and isinstance(obj["items"], dict):
-                traverse_schema(obj["items"], None)
-            
+            items = obj.get("items")
+            if isinstance(items, dict):
+                children.append((items, None))
+
             # Traverse other nested structures (excluding properties, items, and description)
             for key, value in obj.items():
-                if key not in ["properties", "items", "description"]:
+                if key not in _DESCRIPTION_SKIP_KEYS:
                     if isinstance(value, (dict, list)):
-                        traverse_schema(value, None)
-        
+                        children.append((value, None))
+
+            stack.extend(reversed(children))
+
         elif isinstance(obj, list):
-            for item in obj:
-                traverse_schema(item, parent_key)
-    
-    traverse_schema(schema)
+            for item in reversed(obj):
+                if isinstance(item, (dict, list)):
+                    stack.append((item, parent_key))
+
     return descriptions
 
 
+def prepare_schema(schema: Dict[str, Any]) -> Dict[str, Any]:
+    """Prepare a JSON schema for OpenAI structured output in a single pass.
+
+    Combines `inline_defs` and `add_additional_properties_false` into one
+    traversal: $defs references are inlined, title fields are removed, and
+    objects get additionalProperties: false. Use `extract_descriptions` on
+    the original schema to collect field descriptions.
+
+    Args:
+        schema: JSON schema, optionally with $defs (e.g. from a Pydantic model)
+
+    Returns:
+        JSON schema with $defs inlined, titles removed and objects closed
+
+    Raises:
+        ValueError: If a circular reference is detected in the schema.
+    """
+    schema = schema.copy()
+    defs = schema.pop("$defs", {})
+
+    # Iterative traversal: each entry fills slot `key` of `parent`
+    root = [None]
+    stack = [(root, 0, schema, frozenset())]
+    while stack:
+        parent, key, obj, seen_defs = stack.pop()
+
+        if isinstance(obj, dict):
+            if "$ref" in obj:
+                ref = obj["$ref"]
+                if ref.startswith("#/$defs/"):
+                    def_name = ref[8:]
+                    if def_name in seen_defs:
+                        raise ValueError(f"Circular reference detected in schema: {def_name}")
+                    if def_name in defs:
+                        stack.append((parent, key, defs[def_name], seen_defs | {def_name}))
+                        continue
+
+            # Add additionalProperties: false to objects
+            is_object = obj.get("type") == "object"
+
+            # Scalar leaves are copied directly; only containers are stacked
+            out = {}
+            for k, v in obj.items():
+                if k == "title":
+                    continue
+                if is_object and k == "additionalProperties":
+                    # Still walked (for cycle checks), then replaced
+                    out[k] = False
+                    if isinstance(v, (dict, list)):
+                        stack.append(([None], 0, v, seen_defs))
+                elif k == "properties" and isinstance(v, dict):
+                    properties = v.copy()
+                    for prop_key, prop_value in v.items():
+                        if isinstance(prop_value, (dict, list)):
+                            stack.append((properties, prop_key, prop_value, seen_defs))
+                    out[k] = properties
+                else:
+                    out[k] = v
+                    if isinstance(v, (dict, list)):
+                        stack.append((out, k, v, seen_defs))
+            if is_object:
+                out["additionalProperties"] = False
+            parent[key] = out
+
+        elif isinstance(obj, list):
+            out = obj.copy()
+            parent[key] = out
+            for i, item in enumerate(obj):
+                if isinstance(item, (dict, list)):
+                    stack.append((out, i, item, seen_defs))
+
+        else:
+            parent[key] = obj
+
+    return root[0]
+
+
 def create_json_descriptions_prompt(schema: Union[Dict[str, Any], Type[BaseModel]]) -> str:
     """Create a prompt with JSON field descriptions for better schema compliance.
 
@@ -212,10 +353,20 @@ def create_json_descriptions_prompt(schema: Union[Dict[str, Any], Type[BaseModel
     Returns:
         String prompt with field descriptions
     """
-    # Convert Pydantic model to JSON schema if needed
+    # Pydantic models are hashable, so their prompt is cached per class
     if inspect.isclass(schema) and issubclass(schema, BaseModel):
-        schema = schema.model_json_schema()
+        return _model_descriptions_prompt(schema)
+    return _descriptions_prompt(schema)
 
+
+@lru_cache(maxsize=128)
+def _model_descriptions_prompt(model: Type[BaseModel]) -> str:
+    """Build (once per model class) the descriptions prompt for a Pydantic model."""
+    return _descriptions_prompt(model.model_json_schema())
+
+
+def _descriptions_prompt(schema: Dict[str, Any]) -> str:
+    """Format the descriptions of a JSON schema dictionary as a prompt."""
     descriptions = extract_descriptions(schema)
     if not descriptions:
         return ""
@@ -224,6 +375,10 @@ def create_json_descriptions_prompt(schema: Union[Dict[str, Any], Type[BaseModel
     return f"Please extract information to the following JSON fields.\n{description_text}"
 
 
+# Roles accepted in OpenAI-format messages
+_VALID_ROLES = frozenset({"system", "user", "assistant"})
+
+
 def is_openai_messages(contents: Union[List[str], List[Dict[str, str]]]) -> bool:
     """Detect if contents is in OpenAI message format.
 
@@ -245,22 +400,29 @@ def is_openai_messages(contents: Union[List[str], List[Dict[str, str]]]) -> bool
             raise ValueError("Mixed format: contents must be either all strings or all dicts")
         return False
     elif isinstance(contents[0], dict):
-        # Verify all items are dicts with required keys
+        # Verify all items are dicts with required keys (one lookup per key)
         for i, item in enumerate(contents):
             if not isinstance(item, dict):
                 raise ValueError(f"Mixed format: contents must be either all strings or all dicts")
-            if "role" not in item or "content" not in item:
-                raise ValueError(f"Invalid message format at index {i}: missing 'role' or 'content' key")
-            if not isinstance(item["role"], str) or not isinstance(item["content"], str):
+            try:
+                role = item["role"]
+                content = item["content"]
+            except KeyError:
+                raise ValueError(f"Invalid message format at index {i}: missing 'role' or 'content' key") from None
+            if not isinstance(role, str) or not isinstance(content, str):
                 raise ValueError(f"Invalid message format at index {i}: 'role' and 'content' must be strings")
             # Validate role values
-            if item["role"] not in ["system", "user", "assistant"]:
-                raise ValueError(f"Invalid role at index {i}: '{item['role']}' (must be 'system', 'user', or 'assistant')")
+            if role not in _VALID_ROLES:
+                raise ValueError(f"Invalid role at index {i}: '{role}' (must be 'system', 'user', or 'assistant')")
         return True
     else:
         raise ValueError("Invalid contents format: must be List[str] or List[Dict[str, str]]")
 
 
+# OpenAI roles that become Gemini Content objects, mapped to Gemini role names
+_GEMINI_ROLES = {"user": "user", "assistant": "model"}
+
+
 def openai_messages_to_contents(messages: List[Dict[str, str]]) -> tuple[List, Union[str, None]]:
     """Convert OpenAI message format to Gemini Content objects and extract system prompt.
 
@@ -279,6 +441,7 @@ def openai_messages_to_contents(messages: List[Dict[str, str]]) -> tuple[List, U
         - 'system' role is extracted and returned separately
     """
     from google.genai import types
+    Content, Part = types.Content, types.Part
 
     contents = []
     system_prompt = None
@@ -287,27 +450,15 @@ def openai_messages_to_contents(messages: List[Dict[str, str]]) -> tuple[List, U
         role = msg["role"]
         content = msg["content"]
 
-        if role == "system":
+        # Map user/assistant to Gemini roles ('assistant' is 'model' in Gemini)
+        gemini_role = _GEMINI_ROLES.get(role)
+        if gemini_role is not None:
+            contents.append(Content(role=gemini_role, parts=[Part(text=content)]))
+        elif role == "system":
             # Extract system prompt
             if system_prompt is not None:
                 raise ValueError("Multiple system messages found in messages list")
             system_prompt = content
-        elif role == "user":
-            # Map to Gemini user role
-            contents.append(
-                types.Content(
-                    role="user",
-                    parts=[types.Part(text=content)]
-                )
-            )
-        elif role == "assistant":
-            # Map to Gemini model role
-            contents.append(
-                types.Content(
-                    role="model",
-                    parts=[types.Part(text=content)]
-                )
-            )
         else:
             raise ValueError(f"Unsupported role: {role}")
 
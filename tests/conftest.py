@@ -0,0 +1,57 @@
+import os
+from types import SimpleNamespace
+from unittest.mock import Mock
+
+import pytest
+
+from llm7shi import compat, openai as openai_module
+
+
+def pytest_configure(config):
+    """Set dummy API keys once, before any test module is collected.
+
+    Keys are overwritten rather than defaulted so a developer's real keys are
+    never picked up by the (fully mocked) test suite.
+    """
+    os.environ["GEMINI_API_KEY"] = "dummy"
+    os.environ["OPENAI_API_KEY"] = "dummy"
+
+
+@pytest.fixture(autouse=True)
+def _clear_compat_schemas():
+    """Drop cached model schemas so patched schema helpers are always called."""
+    compat._model_json_schema.cache_clear()
+    compat._openai_model_schema.cache_clear()
+    yield
+    compat._model_json_schema.cache_clear()
+    compat._openai_model_schema.cache_clear()
+
+
+@pytest.fixture(autouse=True)
+def _clear_openai_clients():
+    """Drop cached OpenAI clients so each test sees its own patched OpenAI class."""
+    openai_module._get_client.cache_clear()
+    yield
+    openai_module._get_client.cache_clear()
+
+
+@pytest.fixture
+def provider_mocks(monkeypatch):
+    """Replace the compat provider functions with Mocks.
+
+    Returns a namespace with `gemini`, `openai` and `ollama` mocks for
+    `_generate_with_gemini`, `_generate_with_openai` and `_generate_with_ollama`.
+    """
+    mocks = SimpleNamespace(gemini=Mock(), openai=Mock(), ollama=Mock())
+    monkeypatch.setattr(compat, "_generate_with_gemini", mocks.gemini)
+    monkeypatch.setattr(compat, "_generate_with_openai", mocks.openai)
+    monkeypatch.setattr(compat, "_generate_with_ollama", mocks.ollama)
+    return mocks
+
+
+@pytest.fixture
+def openai_generate(monkeypatch):
+    """Replace llm7shi.openai.generate_content with a Mock returning "response"."""
+    mock = Mock(return_value="response")
+    monkeypatch.setattr(openai_module, "generate_content", mock)
+    return mock
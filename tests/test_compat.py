@@ -1,14 +1,19 @@
+import copy
 import pytest
-from unittest.mock import patch, MagicMock
-from typing import List
+from types import SimpleNamespace as NS
+from unittest.mock import patch, Mock
+from typing import List, Optional
 from pydantic import BaseModel, Field
 
-# Set dummy API keys for all tests
-import os
-os.environ["GEMINI_API_KEY"] = "dummy"
-os.environ["OPENAI_API_KEY"] = "dummy"
-
+import llm7shi
+from llm7shi import compat, ollama as ollama_module, openai as openai_module
 from llm7shi.compat import generate_with_schema
+from llm7shi.utils import inline_defs
+
+
+def _chunk(text):
+    """Build a streamed OpenAI chunk carrying text as delta content."""
+    return NS(choices=[NS(delta=NS(content=text, reasoning=None))])
 
 
 class LocationTemperature(BaseModel):
@@ -22,58 +27,53 @@ class LocationList(BaseModel):
     locations: List[LocationTemperature]
 
 
+class Report(BaseModel):
+    """Test Pydantic model with a "title" field and an optional nested model"""
+    title: str
+    location: Optional[LocationTemperature] = None
+
+
 class TestModelSelection:
     """Test model selection logic"""
     
-    @patch('llm7shi.compat._generate_with_gemini')
-    def test_gemini_model_selection(self, mock_gemini):
+    def test_gemini_model_selection(self, provider_mocks):
         """Test that Gemini models are routed to Gemini function"""
-        mock_gemini.return_value = "gemini_response"
-        
         result = generate_with_schema(
             contents=["Test"],
             model="google:gemini-2.5-flash"
         )
         
-        assert result == "gemini_response"
-        mock_gemini.assert_called_once()
+        assert result is provider_mocks.gemini.return_value
+        provider_mocks.gemini.assert_called_once()
     
-    @patch('llm7shi.compat._generate_with_openai')
-    def test_openai_model_selection(self, mock_openai):
+    def test_openai_model_selection(self, provider_mocks):
         """Test that OpenAI models are routed to OpenAI function"""
-        mock_openai.return_value = "openai_response"
-        
         result = generate_with_schema(
             contents=["Test"],
             model="openai:gpt-4.1-mini"
         )
         
-        assert result == "openai_response"
-        mock_openai.assert_called_once()
+        assert result is provider_mocks.openai.return_value
+        provider_mocks.openai.assert_called_once()
     
-    @patch('llm7shi.compat._generate_with_gemini')
-    def test_default_model_selection(self, mock_gemini):
+    def test_default_model_selection(self, provider_mocks):
         """Test default model selection (should use Gemini)"""
-        mock_gemini.return_value = "default_response"
-        
         result = generate_with_schema(contents=["Test"])
         
-        assert result == "default_response"
-        mock_gemini.assert_called_once()
+        assert result is provider_mocks.gemini.return_value
+        provider_mocks.gemini.assert_called_once()
         # Check that default model ("") was passed
-        call_args = mock_gemini.call_args
+        call_args = provider_mocks.gemini.call_args
         assert call_args[0][0] == ""  # model parameter is first positional arg
 
 
 class TestGeminiIntegration:
     """Test integration with Gemini API"""
     
-    @patch('llm7shi.generate_content_retry')
+    @patch.object(llm7shi, "generate_content_retry")
     def test_basic_gemini_generation(self, mock_generate):
         """Test basic text generation with Gemini"""
-        mock_response = MagicMock()
-        mock_response.text = "Gemini response"
-        mock_generate.return_value = mock_response
+        mock_generate.return_value = NS(text="Gemini response")
         
         result = generate_with_schema(
             contents=["Hello World"],
@@ -83,14 +83,12 @@ class TestGeminiIntegration:
         assert result.text == "Gemini response"
         mock_generate.assert_called_once()
     
-    @patch('llm7shi.generate_content_retry')
-    @patch('llm7shi.config_from_schema')
+    @patch.object(llm7shi, "generate_content_retry")
+    @patch.object(llm7shi, "config_from_schema")
     def test_gemini_with_pydantic_schema(self, mock_config, mock_generate):
         """Test Gemini generation with Pydantic schema"""
         mock_config.return_value = {"response_schema": "test_schema"}
-        mock_response = MagicMock()
-        mock_response.text = '{"location": "Tokyo", "temperature": 25.0}'
-        mock_generate.return_value = mock_response
+        mock_generate.return_value = NS(text='{"location": "Tokyo", "temperature": 25.0}')
         
         result = generate_with_schema(
             contents=["Temperature in Tokyo"],
@@ -103,15 +101,13 @@ class TestGeminiIntegration:
         call_args = mock_generate.call_args
         assert call_args[1]['config'] == {"response_schema": "test_schema"}
     
-    @patch('llm7shi.generate_content_retry')
-    @patch('llm7shi.config_from_schema')
+    @patch.object(llm7shi, "generate_content_retry")
+    @patch.object(llm7shi, "config_from_schema")
     def test_gemini_with_json_schema(self, mock_config, mock_generate):
         """Test Gemini generation with JSON schema"""
         json_schema = {"type": "object", "properties": {"name": {"type": "string"}}}
-        mock_config.return_value = MagicMock()
-        mock_response = MagicMock()
-        mock_response.text = '{"name": "test"}'
-        mock_generate.return_value = mock_response
+        mock_config.return_value = Mock()
+        mock_generate.return_value = NS(text='{"name": "test"}')
         
         result = generate_with_schema(
             contents=["Generate name"],
@@ -123,12 +119,10 @@ class TestGeminiIntegration:
         mock_generate.assert_called_once()
         assert result.text == '{"name": "test"}'
     
-    @patch('llm7shi.generate_content_retry')
+    @patch.object(llm7shi, "generate_content_retry")
     def test_gemini_with_temperature(self, mock_generate):
         """Test Gemini generation with temperature parameter"""
-        mock_response = MagicMock()
-        mock_response.text = "Creative response"
-        mock_generate.return_value = mock_response
+        mock_generate.return_value = NS(text="Creative response")
         
         result = generate_with_schema(
             contents=["Be creative"],
@@ -141,12 +135,10 @@ class TestGeminiIntegration:
         assert config.temperature == 0.9
         assert result.text == "Creative response"
     
-    @patch('llm7shi.generate_content_retry')
+    @patch.object(llm7shi, "generate_content_retry")
     def test_gemini_with_system_prompt(self, mock_generate):
         """Test Gemini generation with system prompt"""
-        mock_response = MagicMock()
-        mock_response.text = "Assistant response"
-        mock_generate.return_value = mock_response
+        mock_generate.return_value = NS(text="Assistant response")
         
         result = generate_with_schema(
             contents=["User message"],
@@ -163,23 +155,18 @@ class TestGeminiIntegration:
 class TestOpenAIIntegration:
     """Test integration with OpenAI API"""
 
-    @patch('llm7shi.openai.OpenAI')
-    @patch('llm7shi.compat.contents_to_openai_messages')
+    @patch.object(openai_module, "OpenAI")
+    @patch.object(compat, "contents_to_openai_messages")
     def test_basic_openai_generation(self, mock_messages, mock_openai_class):
         """Test basic text generation with OpenAI"""
         mock_messages.return_value = [{"role": "user", "content": "Hello"}]
 
         # Mock OpenAI client instance
-        mock_client = MagicMock()
+        mock_client = Mock()
         mock_openai_class.return_value = mock_client
 
         # Mock streaming response
-        mock_chunk = MagicMock()
-        mock_chunk.choices = [MagicMock()]
-        mock_chunk.choices[0].delta = MagicMock()
-        mock_chunk.choices[0].delta.content = "OpenAI response"
-        mock_chunk.choices[0].delta.reasoning = None
-        mock_client.chat.completions.create.return_value = [mock_chunk]
+        mock_client.chat.completions.create.return_value = [_chunk("OpenAI response")]
 
         result = generate_with_schema(
             contents=["Hello World"],
@@ -189,25 +176,104 @@ class TestOpenAIIntegration:
         assert result.text == "OpenAI response"
         mock_client.chat.completions.create.assert_called_once()
     
-    @patch('llm7shi.openai.OpenAI')
-    @patch('llm7shi.compat.contents_to_openai_messages')
-    @patch('llm7shi.compat.add_additional_properties_false')
-    @patch('llm7shi.compat.inline_defs')
-    def test_openai_with_pydantic_schema(self, mock_inline, mock_add_props, mock_messages, mock_openai_class):
+    @patch.object(openai_module, "OpenAI")
+    def test_openai_client_reused(self, mock_openai_class):
+        """Test clients are cached per endpoint and API key"""
+        mock_client = mock_openai_class.return_value
+        mock_chunk = _chunk("OK")
+        mock_client.chat.completions.create.side_effect = lambda **kwargs: [mock_chunk]
+
+        for _ in range(2):
+            generate_with_schema(["Hi"], model="openai:gpt-4.1-mini", file=None)
+        assert mock_openai_class.call_count == 1
+
+        generate_with_schema(["Hi"], model="openai:local@http://localhost:8080/v1", file=None)
+        assert mock_openai_class.call_count == 2
+        mock_openai_class.assert_called_with(base_url="http://localhost:8080/v1", api_key="")
+
+    @patch.object(openai_module, "OpenAI")
+    def test_openai_client_tracks_sdk_env(self, mock_openai_class, monkeypatch):
+        """Test a changed SDK environment setting gets a new client"""
+        mock_client = mock_openai_class.return_value
+        mock_chunk = _chunk("OK")
+        mock_client.chat.completions.create.side_effect = lambda **kwargs: [mock_chunk]
+        monkeypatch.delenv("OPENAI_BASE_URL", raising=False)
+
+        generate_with_schema(["Hi"], model="openai:gpt-4.1-mini", file=None)
+        monkeypatch.setenv("OPENAI_BASE_URL", "http://proxy.example/v1")
+        generate_with_schema(["Hi"], model="openai:gpt-4.1-mini", file=None)
+        generate_with_schema(["Hi"], model="openai:gpt-4.1-mini", file=None)
+
+        assert mock_openai_class.call_count == 2
+
+    @patch.object(openai_module, "OpenAI")
+    @patch.object(compat, "prepare_schema")
+    def test_openai_model_schema_cached(self, mock_prepare, mock_openai_class):
+        """Test Pydantic schemas are prepared once per model class"""
+        mock_prepare.return_value = {"processed": "schema"}
+        mock_client = mock_openai_class.return_value
+        mock_chunk = _chunk("{}")
+        mock_client.chat.completions.create.side_effect = lambda **kwargs: [mock_chunk]
+
+        for _ in range(2):
+            generate_with_schema(["Hi"], schema=LocationTemperature, model="openai:gpt-4.1-mini", file=None)
+        mock_prepare.assert_called_once()
+        response_format = mock_client.chat.completions.create.call_args[1]["response_format"]
+        assert response_format["json_schema"]["schema"] == {"processed": "schema"}
+
+        generate_with_schema(["Hi"], schema=LocationList, model="openai:gpt-4.1-mini", file=None)
+        assert mock_prepare.call_count == 2
+
+    @patch.object(openai_module, "OpenAI")
+    def test_openai_cached_schema_not_shared(self, mock_openai_class):
+        """Test modifying a returned schema does not change later requests"""
+        mock_client = mock_openai_class.return_value
+        mock_chunk = _chunk("{}")
+        mock_client.chat.completions.create.side_effect = lambda **kwargs: [mock_chunk]
+
+        result = generate_with_schema(["Hi"], schema=LocationTemperature, model="openai:gpt-4.1-mini", file=None)
+        schema = result.config["response_format"]["json_schema"]["schema"]
+        expected = copy.deepcopy(schema)
+        schema["properties"]["location"]["type"] = "integer"
+        schema["required"].append("extra")
+
+        generate_with_schema(["Hi"], schema=LocationTemperature, model="openai:gpt-4.1-mini", file=None)
+        response_format = mock_client.chat.completions.create.call_args[1]["response_format"]
+        assert response_format["json_schema"]["schema"] == expected
+
+    @patch.object(openai_module, "OpenAI")
+    def test_openai_pydantic_and_dict_schema_match(self, mock_openai_class):
+        """Test a Pydantic model and its equivalent dict schema send the same payload"""
+        mock_client = mock_openai_class.return_value
+        mock_chunk = _chunk("{}")
+        mock_client.chat.completions.create.side_effect = lambda **kwargs: [mock_chunk]
+
+        equivalent = inline_defs(Report.model_json_schema())
+        for schema in (Report, equivalent):
+            generate_with_schema(["Hi"], schema=schema, model="openai:gpt-4.1-mini", file=None)
+
+        from_model, from_dict = (
+            call[1]["response_format"] for call in mock_client.chat.completions.create.call_args_list
+        )
+        assert from_model == from_dict
+        schema = from_model["json_schema"]["schema"]
+        assert "title" in schema["properties"]
+        assert schema["properties"]["location"]["anyOf"][0]["additionalProperties"] is False
+
+    @patch.object(openai_module, "OpenAI")
+    @patch.object(compat, "contents_to_openai_messages")
+    @patch.object(compat, "add_additional_properties_false")
+    @patch.object(compat, "prepare_schema")
+    def test_openai_with_pydantic_schema(self, mock_prepare, mock_add_props, mock_messages, mock_openai_class):
         """Test OpenAI generation with Pydantic schema"""
         mock_messages.return_value = [{"role": "user", "content": "Test"}]
-        mock_add_props.return_value = {"processed": "schema"}
-        mock_inline.return_value = {"final": "schema"}
+        mock_prepare.return_value = {"processed": "schema"}
 
         # Mock OpenAI client instance
-        mock_client = MagicMock()
+        mock_client = Mock()
         mock_openai_class.return_value = mock_client
 
-        mock_response = MagicMock()
-        mock_response.choices = [MagicMock()]
-        mock_response.choices[0].message = MagicMock()
-        mock_response.choices[0].message.content = '{"location": "Tokyo", "temperature": 25}'
-        mock_client.chat.completions.create.return_value = mock_response
+        mock_client.chat.completions.create.return_value = [_chunk('{"location": "Tokyo", "temperature": 25}')]
 
         result = generate_with_schema(
             contents=["Temperature data"],
@@ -215,34 +281,29 @@ class TestOpenAIIntegration:
             model="openai:gpt-4.1-mini"
         )
 
-        # Verify schema processing pipeline
-        mock_add_props.assert_called_once()
-        mock_inline.assert_called_once()
+        # Verify schema processing pipeline (single pass, no separate adjustment)
+        mock_prepare.assert_called_once()
+        mock_add_props.assert_not_called()
 
         # Verify OpenAI API call
         call_args = mock_client.chat.completions.create.call_args
         assert call_args[1]['response_format']['json_schema']['schema'] == {"processed": "schema"}
     
-    @patch('llm7shi.openai.OpenAI')
-    @patch('llm7shi.compat.contents_to_openai_messages')
-    @patch('llm7shi.compat.add_additional_properties_false')
-    @patch('llm7shi.compat.inline_defs')
-    def test_openai_with_json_schema(self, mock_inline, mock_add_props, mock_messages, mock_openai_class):
+    @patch.object(openai_module, "OpenAI")
+    @patch.object(compat, "contents_to_openai_messages")
+    @patch.object(compat, "add_additional_properties_false")
+    @patch.object(compat, "prepare_schema")
+    def test_openai_with_json_schema(self, mock_prepare, mock_add_props, mock_messages, mock_openai_class):
         """Test OpenAI generation with JSON schema"""
         json_schema = {"type": "object", "properties": {"name": {"type": "string"}}}
         mock_messages.return_value = [{"role": "user", "content": "Test"}]
         mock_add_props.return_value = {"processed": "schema"}
-        mock_inline.return_value = {"final": "schema"}
 
         # Mock OpenAI client instance
-        mock_client = MagicMock()
+        mock_client = Mock()
         mock_openai_class.return_value = mock_client
 
-        mock_response = MagicMock()
-        mock_response.choices = [MagicMock()]
-        mock_response.choices[0].message = MagicMock()
-        mock_response.choices[0].message.content = '{"name": "test"}'
-        mock_client.chat.completions.create.return_value = mock_response
+        mock_client.chat.completions.create.return_value = [_chunk('{"name": "test"}')]
 
         result = generate_with_schema(
             contents=["Generate name"],
@@ -251,23 +312,20 @@ class TestOpenAIIntegration:
         )
 
         mock_add_props.assert_called_once_with(json_schema)
-        # inline_defs is not called for non-Pydantic schemas in current implementation
+        # $defs are not inlined for non-Pydantic schemas in current implementation
+        mock_prepare.assert_not_called()
 
-    @patch('llm7shi.openai.OpenAI')
-    @patch('llm7shi.compat.contents_to_openai_messages')
+    @patch.object(openai_module, "OpenAI")
+    @patch.object(compat, "contents_to_openai_messages")
     def test_openai_with_temperature(self, mock_messages, mock_openai_class):
         """Test OpenAI generation with temperature parameter"""
         mock_messages.return_value = [{"role": "user", "content": "Test"}]
 
         # Mock OpenAI client instance
-        mock_client = MagicMock()
+        mock_client = Mock()
         mock_openai_class.return_value = mock_client
 
-        mock_response = MagicMock()
-        mock_response.choices = [MagicMock()]
-        mock_response.choices[0].message = MagicMock()
-        mock_response.choices[0].message.content = "Creative response"
-        mock_client.chat.completions.create.return_value = mock_response
+        mock_client.chat.completions.create.return_value = [_chunk("Creative response")]
 
         result = generate_with_schema(
             contents=["Be creative"],
@@ -278,8 +336,8 @@ class TestOpenAIIntegration:
         call_args = mock_client.chat.completions.create.call_args
         assert call_args[1]['temperature'] == 0.8
 
-    @patch('llm7shi.openai.OpenAI')
-    @patch('llm7shi.compat.contents_to_openai_messages')
+    @patch.object(openai_module, "OpenAI")
+    @patch.object(compat, "contents_to_openai_messages")
     def test_openai_with_system_prompt(self, mock_messages, mock_openai_class):
         """Test OpenAI generation with system prompt"""
         mock_messages.return_value = [
@@ -288,14 +346,10 @@ class TestOpenAIIntegration:
         ]
 
         # Mock OpenAI client instance
-        mock_client = MagicMock()
+        mock_client = Mock()
         mock_openai_class.return_value = mock_client
 
-        mock_response = MagicMock()
-        mock_response.choices = [MagicMock()]
-        mock_response.choices[0].message = MagicMock()
-        mock_response.choices[0].message.content = "How can I help?"
-        mock_client.chat.completions.create.return_value = mock_response
+        mock_client.chat.completions.create.return_value = [_chunk("How can I help?")]
 
         result = generate_with_schema(
             contents=["Hello"],
@@ -309,11 +363,11 @@ class TestOpenAIIntegration:
 class TestErrorHandling:
     """Test error handling scenarios"""
 
-    @patch('llm7shi.openai.OpenAI')
+    @patch.object(openai_module, "OpenAI")
     def test_openai_api_error(self, mock_openai_class):
         """Test handling of OpenAI API errors"""
         # Mock OpenAI client instance
-        mock_client = MagicMock()
+        mock_client = Mock()
         mock_openai_class.return_value = mock_client
         mock_client.chat.completions.create.side_effect = Exception("API Error")
 
@@ -323,23 +377,18 @@ class TestErrorHandling:
                 model="openai:gpt-4.1-mini"
             )
 
-    @patch('llm7shi.openai.OpenAI')
-    @patch('llm7shi.compat.contents_to_openai_messages')
+    @patch.object(openai_module, "OpenAI")
+    @patch.object(compat, "contents_to_openai_messages")
     def test_unsupported_model(self, mock_messages, mock_openai_class):
         """Test error handling for unsupported model names"""
         # Unsupported models go to OpenAI path, so mock it properly
         mock_messages.return_value = [{"role": "user", "content": "Test"}]
 
         # Mock OpenAI client instance
-        mock_client = MagicMock()
+        mock_client = Mock()
         mock_openai_class.return_value = mock_client
 
-        mock_chunk = MagicMock()
-        mock_chunk.choices = [MagicMock()]
-        mock_chunk.choices[0].delta = MagicMock()
-        mock_chunk.choices[0].delta.content = "fallback_response"
-        mock_chunk.choices[0].delta.reasoning = None
-        mock_client.chat.completions.create.return_value = [mock_chunk]
+        mock_client.chat.completions.create.return_value = [_chunk("fallback_response")]
 
         result = generate_with_schema(
             contents=["Test"],
@@ -352,47 +401,69 @@ class TestErrorHandling:
 class TestSchemaProcessing:
     """Test schema processing utilities"""
     
-    def test_pydantic_model_detection(self):
+    def test_pydantic_model_detection(self, provider_mocks):
         """Test that Pydantic models are correctly identified"""
-        with patch('llm7shi.compat._generate_with_gemini') as mock_gemini:
-            mock_gemini.return_value = MagicMock()
-            
-            # Test with Pydantic model
-            generate_with_schema(
-                contents=["Test"],
-                schema=LocationTemperature,
-                model="google:gemini-2.5-flash"
-            )
-            
-            # Should use config_from_schema path
-            mock_gemini.assert_called_once()
+        # Test with Pydantic model
+        generate_with_schema(
+            contents=["Test"],
+            schema=LocationTemperature,
+            model="google:gemini-2.5-flash"
+        )
+        
+        # Should use config_from_schema path
+        provider_mocks.gemini.assert_called_once()
     
-    def test_json_schema_processing(self):
+    def test_json_schema_processing(self, provider_mocks):
         """Test that JSON schemas are correctly processed"""
-        with patch('llm7shi.compat._generate_with_gemini') as mock_gemini:
-            mock_gemini.return_value = "test_result"
-            
-            json_schema = {"type": "object"}
-            result = generate_with_schema(
-                contents=["Test"],
-                schema=json_schema,
-                model="google:gemini-2.5-flash"
-            )
-            
-            # Should call _generate_with_gemini once
-            mock_gemini.assert_called_once()
-            assert result == "test_result"
+        json_schema = {"type": "object"}
+        result = generate_with_schema(
+            contents=["Test"],
+            schema=json_schema,
+            model="google:gemini-2.5-flash"
+        )
+        
+        # Should call _generate_with_gemini once
+        provider_mocks.gemini.assert_called_once()
+        assert result is provider_mocks.gemini.return_value
     
-    def test_no_schema_provided(self):
+    def test_no_schema_provided(self, provider_mocks):
         """Test generation without schema"""
-        with patch('llm7shi.compat._generate_with_gemini') as mock_gemini:
-            mock_gemini.return_value = MagicMock()
-            
-            generate_with_schema(
-                contents=["Test"],
-                model="google:gemini-2.5-flash"
-            )
-            
-            call_args = mock_gemini.call_args
-            # Should not pass config when no schema
-            assert 'config' not in call_args[1] or call_args[1]['config'] is None
+        generate_with_schema(
+            contents=["Test"],
+            model="google:gemini-2.5-flash"
+        )
+        
+        kwargs = provider_mocks.gemini.call_args.kwargs
+        # Should not pass config when no schema
+        assert kwargs.get('config') is None
+
+    @patch.object(ollama_module, "generate_content")
+    def test_ollama_pydantic_schema_cached(self, mock_generate):
+        """Test Pydantic models are converted to JSON schema once for Ollama"""
+        expected = LocationTemperature.model_json_schema()
+        with patch.object(LocationTemperature, "model_json_schema", return_value=expected) as mock_schema:
+            for _ in range(2):
+                generate_with_schema(
+                    contents=["Test"],
+                    schema=LocationTemperature,
+                    model="ollama:qwen3:4b",
+                    file=None
+                )
+
+        mock_schema.assert_called_once()
+        first, second = (call[1]["format"] for call in mock_generate.call_args_list)
+        assert first == second == expected
+
+    @patch.object(ollama_module, "generate_content")
+    def test_ollama_cached_schema_not_shared(self, mock_generate):
+        """Test modifying the Ollama format does not change later requests"""
+        expected = LocationTemperature.model_json_schema()
+
+        generate_with_schema(["Test"], schema=LocationTemperature, model="ollama:qwen3:4b", file=None)
+        mock_generate.call_args[1]["format"]["properties"]["location"]["type"] = "integer"
+
+        generate_with_schema(["Test"], schema=LocationTemperature, model="ollama:qwen3:4b", file=None)
+        assert mock_generate.call_args[1]["format"] == expected
+
+        # The OpenAI schema is prepared from the same cached schema
+        assert compat._openai_model_schema(LocationTemperature)["properties"]["location"]["type"] == "string"
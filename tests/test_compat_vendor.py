@@ -1,113 +1,42 @@
 import pytest
-from unittest.mock import patch
 
-# Set dummy API keys for all tests
-import os
-os.environ["GEMINI_API_KEY"] = "dummy"
-os.environ["OPENAI_API_KEY"] = "dummy"
-
-from llm7shi.compat import generate_with_schema
+from llm7shi.compat import OPENAI_COMPATIBLE_VENDORS, generate_with_schema
 
 
 class TestVendorPrefixSelection:
     """Test vendor prefix model selection logic"""
-    
-    @patch('llm7shi.compat._generate_with_openai')
-    def test_openai_vendor_prefix(self, mock_openai):
-        """Test OpenAI vendor prefix routing"""
-        mock_openai.return_value = "prefix_response"
-        
-        result = generate_with_schema(
-            contents=["Test"],
-            model="openai:gpt-4.1-mini"
-        )
-        
-        assert result == "prefix_response"
-        mock_openai.assert_called_once()
-        # Check that vendor prefix was removed
-        call_args = mock_openai.call_args
-        assert call_args[0][0] == "gpt-4.1-mini"
-    
-    @patch('llm7shi.compat._generate_with_gemini')
-    def test_google_vendor_prefix(self, mock_gemini):
-        """Test Google vendor prefix routing"""
-        mock_gemini.return_value = "google_response"
-        
-        result = generate_with_schema(
-            contents=["Test"],
-            model="google:gemini-2.5-flash"
-        )
-        
-        assert result == "google_response"
-        mock_gemini.assert_called_once()
-        # Check that vendor prefix was removed
-        call_args = mock_gemini.call_args
-        assert call_args[0][0] == "gemini-2.5-flash"
-    
-    @patch('llm7shi.compat._generate_with_openai')
-    def test_empty_openai_prefix(self, mock_openai):
-        """Test empty OpenAI prefix uses default model"""
-        mock_openai.return_value = "empty_response"
-        
-        result = generate_with_schema(
-            contents=["Test"],
-            model="openai:"
-        )
-        
-        assert result == "empty_response"
-        mock_openai.assert_called_once()
-        # Check that empty string was passed (will use default model)
-        call_args = mock_openai.call_args
-        assert call_args[0][0] == ""
-    
-    @patch('llm7shi.compat._generate_with_gemini')
-    def test_empty_google_prefix(self, mock_gemini):
-        """Test empty Google prefix uses default model"""
-        mock_gemini.return_value = "empty_google_response"
-        
-        result = generate_with_schema(
-            contents=["Test"],
-            model="google:"
-        )
-        
-        assert result == "empty_google_response"
-        mock_gemini.assert_called_once()
-        # Check that empty string was passed (will use default model)
-        call_args = mock_gemini.call_args
-        assert call_args[0][0] == ""
-    
-    @patch('llm7shi.compat._generate_with_ollama')
-    def test_ollama_vendor_prefix(self, mock_ollama):
-        """Test Ollama vendor prefix routing"""
-        mock_ollama.return_value = "ollama_response"
-        
-        result = generate_with_schema(
-            contents=["Test"],
-            model="ollama:qwen3:4b"
-        )
-        
-        assert result == "ollama_response"
-        mock_ollama.assert_called_once()
-        # Check that vendor prefix was removed
-        call_args = mock_ollama.call_args
-        assert call_args[0][0] == "qwen3:4b"
-    
-    @patch('llm7shi.compat._generate_with_ollama')
-    def test_empty_ollama_prefix(self, mock_ollama):
-        """Test empty Ollama prefix uses default model"""
-        mock_ollama.return_value = "empty_ollama_response"
-        
-        result = generate_with_schema(
-            contents=["Test"],
-            model="ollama:"
-        )
-        
-        assert result == "empty_ollama_response"
-        mock_ollama.assert_called_once()
-        # Check that empty string was passed (will use default model)
-        call_args = mock_ollama.call_args
-        assert call_args[0][0] == ""
-    
+
+    @pytest.mark.parametrize("model, target, expected_model", [
+        # Vendor prefix is removed before routing
+        pytest.param("openai:gpt-4.1-mini", "_generate_with_openai", "gpt-4.1-mini", id="openai"),
+        pytest.param("google:gemini-2.5-flash", "_generate_with_gemini", "gemini-2.5-flash", id="google"),
+        pytest.param("ollama:qwen3:4b", "_generate_with_ollama", "qwen3:4b", id="ollama"),
+        # Empty prefix passes an empty string (provider uses its default model)
+        pytest.param("openai:", "_generate_with_openai", "", id="empty-openai"),
+        pytest.param("google:", "_generate_with_gemini", "", id="empty-google"),
+        pytest.param("ollama:", "_generate_with_ollama", "", id="empty-ollama"),
+        # Backward compatibility for model names without prefix
+        pytest.param("gemini-2.5-flash", "_generate_with_gemini", "gemini-2.5-flash", id="compat-gemini"),
+        pytest.param("gpt-4.1-mini", "_generate_with_openai", "gpt-4.1-mini", id="compat-openai"),
+        # Unknown model name defaults to OpenAI
+        pytest.param("some-unknown-model", "_generate_with_openai", "some-unknown-model", id="unknown-model"),
+    ])
+    def test_vendor_routing(self, provider_mocks, model, target, expected_model):
+        """Test each model string is routed to the right provider with the right model name"""
+        mocks = {
+            "_generate_with_gemini": provider_mocks.gemini,
+            "_generate_with_openai": provider_mocks.openai,
+            "_generate_with_ollama": provider_mocks.ollama,
+        }
+        result = generate_with_schema(contents=["Test"], model=model)
+
+        assert result is mocks[target].return_value
+        mocks[target].assert_called_once()
+        assert mocks[target].call_args[0][0] == expected_model
+        for name, mock in mocks.items():
+            if name != target:
+                mock.assert_not_called()
+
     def test_unsupported_vendor_prefix(self):
         """Test unsupported vendor prefix raises ValueError"""
         with pytest.raises(ValueError, match="Unsupported vendor prefix: unknown"):
@@ -115,332 +44,122 @@ class TestVendorPrefixSelection:
                 contents=["Test"],
                 model="unknown:some-model"
             )
-    
-    @patch('llm7shi.compat._generate_with_gemini')
-    def test_backward_compatibility_gemini(self, mock_gemini):
-        """Test backward compatibility for gemini models without prefix"""
-        mock_gemini.return_value = "compat_response"
-        
-        result = generate_with_schema(
-            contents=["Test"],
-            model="gemini-2.5-flash"
-        )
-        
-        assert result == "compat_response"
-        mock_gemini.assert_called_once()
-        call_args = mock_gemini.call_args
-        assert call_args[0][0] == "gemini-2.5-flash"
-    
-    @patch('llm7shi.compat._generate_with_openai')
-    def test_backward_compatibility_openai(self, mock_openai):
-        """Test backward compatibility for non-gemini models without prefix"""
-        mock_openai.return_value = "compat_openai_response"
-        
-        result = generate_with_schema(
-            contents=["Test"],
-            model="gpt-4.1-mini"
-        )
-        
-        assert result == "compat_openai_response"
-        mock_openai.assert_called_once()
-        call_args = mock_openai.call_args
-        assert call_args[0][0] == "gpt-4.1-mini"
-    
-    @patch('llm7shi.compat._generate_with_openai')
-    def test_unknown_model_defaults_to_openai(self, mock_openai):
-        """Test unknown model name defaults to OpenAI"""
-        mock_openai.return_value = "unknown_model_response"
 
-        result = generate_with_schema(
-            contents=["Test"],
-            model="some-unknown-model"
-        )
 
-        assert result == "unknown_model_response"
-        mock_openai.assert_called_once()
-        call_args = mock_openai.call_args
-        assert call_args[0][0] == "some-unknown-model"
+def _assert_openai_call(mock_generate, model, expected_model, expected_base_url, expected_api_key_env):
+    """Route model through generate_with_schema and check the OpenAI call arguments."""
+    result = generate_with_schema(contents=["Test"], model=model)
+
+    assert result == "response"
+    mock_generate.assert_called_once()
+    call_kwargs = mock_generate.call_args.kwargs
+    assert call_kwargs["model"] == expected_model
+    assert call_kwargs["base_url"] == expected_base_url
+    assert call_kwargs["api_key_env"] == expected_api_key_env
 
 
 class TestBaseUrlAndApiKeyEnvParsing:
     """Test base_url and api_key_env parsing from model string"""
 
-    @patch('llm7shi.openai.generate_content')
-    def test_model_with_base_url_only(self, mock_generate):
-        """Test model@base_url syntax without api_key_env"""
-        mock_generate.return_value = "response"
-
-        result = generate_with_schema(
-            contents=["Test"],
-            model="openai:gpt-4@http://localhost:8080/v1"
-        )
-
-        assert result == "response"
-        mock_generate.assert_called_once()
-
-        # Check that base_url was extracted and api_key_env is None
-        call_kwargs = mock_generate.call_args.kwargs
-        assert call_kwargs["base_url"] == "http://localhost:8080/v1"
-        assert call_kwargs["api_key_env"] is None
-
-        # Check that model name was cleaned
-        assert mock_generate.call_args.kwargs["model"] == "gpt-4"
-
-    @patch('llm7shi.openai.generate_content')
-    def test_model_with_base_url_and_api_key_env(self, mock_generate):
-        """Test model@base_url|api_key_env syntax"""
-        mock_generate.return_value = "response"
-
-        result = generate_with_schema(
-            contents=["Test"],
-            model="openai:gpt-4@http://localhost:8080/v1|MY_API_KEY"
-        )
-
-        assert result == "response"
-        mock_generate.assert_called_once()
-
-        # Check that both base_url and api_key_env were extracted
-        call_kwargs = mock_generate.call_args.kwargs
-        assert call_kwargs["base_url"] == "http://localhost:8080/v1"
-        assert call_kwargs["api_key_env"] == "MY_API_KEY"
-
-        # Check that model name was cleaned
-        assert mock_generate.call_args.kwargs["model"] == "gpt-4"
-
-    @patch('llm7shi.openai.generate_content')
-    def test_model_without_base_url(self, mock_generate):
-        """Test model without @base_url syntax"""
-        mock_generate.return_value = "response"
-
-        result = generate_with_schema(
-            contents=["Test"],
-            model="openai:gpt-4.1-mini"
-        )
-
-        assert result == "response"
-        mock_generate.assert_called_once()
-
-        # Check that base_url and api_key_env are None
-        call_kwargs = mock_generate.call_args.kwargs
-        assert call_kwargs["base_url"] is None
-        assert call_kwargs["api_key_env"] is None
-
-        # Check that model name was preserved
-        assert mock_generate.call_args.kwargs["model"] == "gpt-4.1-mini"
-
-    @patch('llm7shi.openai.generate_content')
-    def test_base_url_with_port(self, mock_generate):
-        """Test base_url with port number (colon in URL)"""
-        mock_generate.return_value = "response"
-
-        result = generate_with_schema(
-            contents=["Test"],
-            model="openai:llama.cpp/gpt-oss@http://192.168.0.8:8080/v1|CUSTOM_KEY"
-        )
-
-        assert result == "response"
-        mock_generate.assert_called_once()
-
-        # Check that URL with port was parsed correctly
-        call_kwargs = mock_generate.call_args.kwargs
-        assert call_kwargs["base_url"] == "http://192.168.0.8:8080/v1"
-        assert call_kwargs["api_key_env"] == "CUSTOM_KEY"
-        assert mock_generate.call_args.kwargs["model"] == "llama.cpp/gpt-oss"
-
-    @patch('llm7shi.openai.generate_content')
-    def test_empty_api_key_env(self, mock_generate):
-        """Test model@base_url| with empty api_key_env"""
-        mock_generate.return_value = "response"
-
-        result = generate_with_schema(
-            contents=["Test"],
-            model="openai:gpt-4@http://localhost:8080/v1|"
-        )
-
-        assert result == "response"
-        mock_generate.assert_called_once()
-
-        # Check that empty string api_key_env was extracted
-        call_kwargs = mock_generate.call_args.kwargs
-        assert call_kwargs["base_url"] == "http://localhost:8080/v1"
-        assert call_kwargs["api_key_env"] == ""
-
-    @patch('llm7shi.openai.generate_content')
-    def test_api_key_env_with_underscores(self, mock_generate):
-        """Test api_key_env with underscores and numbers"""
-        mock_generate.return_value = "response"
-
-        result = generate_with_schema(
-            contents=["Test"],
-            model="openai:gpt-4@http://localhost:8080/v1|MY_CUSTOM_API_KEY_123"
-        )
-
-        assert result == "response"
-        mock_generate.assert_called_once()
-
-        # Check that api_key_env with special characters was parsed
-        call_kwargs = mock_generate.call_args.kwargs
-        assert call_kwargs["api_key_env"] == "MY_CUSTOM_API_KEY_123"
+    @pytest.mark.parametrize("model, expected_model, expected_base_url, expected_api_key_env", [
+        # model@base_url without api_key_env
+        pytest.param("openai:gpt-4@http://localhost:8080/v1",
+                     "gpt-4", "http://localhost:8080/v1", None, id="base-url-only"),
+        # model@base_url|api_key_env
+        pytest.param("openai:gpt-4@http://localhost:8080/v1|MY_API_KEY",
+                     "gpt-4", "http://localhost:8080/v1", "MY_API_KEY", id="base-url-and-api-key-env"),
+        # No custom endpoint
+        pytest.param("openai:gpt-4.1-mini",
+                     "gpt-4.1-mini", None, None, id="no-base-url"),
+        # URL with port (colon in URL)
+        pytest.param("openai:llama.cpp/gpt-oss@http://192.168.0.8:8080/v1|CUSTOM_KEY",
+                     "llama.cpp/gpt-oss", "http://192.168.0.8:8080/v1", "CUSTOM_KEY", id="base-url-with-port"),
+        # Trailing pipe gives an empty api_key_env
+        pytest.param("openai:gpt-4@http://localhost:8080/v1|",
+                     "gpt-4", "http://localhost:8080/v1", "", id="empty-api-key-env"),
+        # api_key_env with underscores and numbers
+        pytest.param("openai:gpt-4@http://localhost:8080/v1|MY_CUSTOM_API_KEY_123",
+                     "gpt-4", "http://localhost:8080/v1", "MY_CUSTOM_API_KEY_123", id="api-key-env-with-underscores"),
+    ])
+    def test_model_string_parsing(self, openai_generate, model, expected_model, expected_base_url, expected_api_key_env):
+        """Test model name, base_url and api_key_env are extracted from the model string"""
+        _assert_openai_call(openai_generate, model, expected_model, expected_base_url, expected_api_key_env)
+
+
+# Expected (default_model, base_url, api_key_env) per vendor, written out
+# literally so a wrong entry in OPENAI_COMPATIBLE_VENDORS fails the tests
+_VENDOR_DEFAULTS = {
+    "openrouter": ("google/gemma-3-4b-it:free", "https://openrouter.ai/api/v1", "OPENROUTER_API_KEY"),
+    "groq": ("llama-3.1-8b-instant", "https://api.groq.com/openai/v1", "GROQ_API_KEY"),
+    "grok": ("grok-4-1-fast-non-reasoning", "https://api.x.ai/v1", "XAI_API_KEY"),
+    "cerebras": ("llama3.1-8b", "https://api.cerebras.ai/v1", "CEREBRAS_API_KEY"),
+}
 
 
 class TestOpenAICompatibleVendors:
-    """Test OpenAI-compatible vendor prefixes (openrouter, groq, grok)"""
-
-    @patch('llm7shi.openai.generate_content')
-    def test_openrouter_with_default_model(self, mock_generate):
-        """Test openrouter: prefix uses default model"""
-        mock_generate.return_value = "response"
-
-        result = generate_with_schema(
-            contents=["Test"],
-            model="openrouter:"
-        )
-
-        assert result == "response"
-        mock_generate.assert_called_once()
-
-        # Check that default model and vendor config were applied
-        call_kwargs = mock_generate.call_args.kwargs
-        assert call_kwargs["model"] == "google/gemma-3-4b-it:free"
-        assert call_kwargs["base_url"] == "https://openrouter.ai/api/v1"
-        assert call_kwargs["api_key_env"] == "OPENROUTER_API_KEY"
-
-    @patch('llm7shi.openai.generate_content')
-    def test_openrouter_with_specific_model(self, mock_generate):
-        """Test openrouter: prefix with specific model"""
-        mock_generate.return_value = "response"
-
-        result = generate_with_schema(
-            contents=["Test"],
-            model="openrouter:anthropic/claude-3.5-sonnet"
-        )
-
-        assert result == "response"
-        mock_generate.assert_called_once()
-
-        # Check that vendor config was applied to specified model
-        call_kwargs = mock_generate.call_args.kwargs
-        assert call_kwargs["model"] == "anthropic/claude-3.5-sonnet"
-        assert call_kwargs["base_url"] == "https://openrouter.ai/api/v1"
-        assert call_kwargs["api_key_env"] == "OPENROUTER_API_KEY"
-
-    @patch('llm7shi.openai.generate_content')
-    def test_groq_vendor_prefix(self, mock_generate):
-        """Test groq: vendor prefix"""
-        mock_generate.return_value = "response"
-
-        result = generate_with_schema(
-            contents=["Test"],
-            model="groq:llama-3.3-70b-versatile"
-        )
-
-        assert result == "response"
-        mock_generate.assert_called_once()
-
-        # Check that groq vendor config was applied
-        call_kwargs = mock_generate.call_args.kwargs
-        assert call_kwargs["model"] == "llama-3.3-70b-versatile"
-        assert call_kwargs["base_url"] == "https://api.groq.com/openai/v1"
-        assert call_kwargs["api_key_env"] == "GROQ_API_KEY"
-
-    @patch('llm7shi.openai.generate_content')
-    def test_grok_vendor_prefix(self, mock_generate):
-        """Test grok: vendor prefix"""
-        mock_generate.return_value = "response"
-
-        result = generate_with_schema(
-            contents=["Test"],
-            model="grok:grok-4-1"
-        )
-
-        assert result == "response"
-        mock_generate.assert_called_once()
-
-        # Check that grok vendor config was applied
-        call_kwargs = mock_generate.call_args.kwargs
-        assert call_kwargs["model"] == "grok-4-1"
-        assert call_kwargs["base_url"] == "https://api.x.ai/v1"
-        assert call_kwargs["api_key_env"] == "XAI_API_KEY"
-
-    @patch('llm7shi.openai.generate_content')
-    def test_openrouter_with_custom_url(self, mock_generate):
-        """Test that user-specified @base_url is not overridden"""
-        mock_generate.return_value = "response"
-
-        result = generate_with_schema(
-            contents=["Test"],
-            model="openrouter:custom-model@http://custom-url/v1|MY_KEY"
-        )
-
-        assert result == "response"
-        mock_generate.assert_called_once()
-
-        # Check that user's custom URL was preserved (no vendor defaults applied)
-        call_kwargs = mock_generate.call_args.kwargs
-        assert call_kwargs["model"] == "custom-model"
-        assert call_kwargs["base_url"] == "http://custom-url/v1"
-        assert call_kwargs["api_key_env"] == "MY_KEY"
-
-    @patch('llm7shi.openai.generate_content')
-    def test_groq_default_model(self, mock_generate):
-        """Test groq: prefix with empty model uses default"""
-        mock_generate.return_value = "response"
-
-        result = generate_with_schema(
-            contents=["Test"],
-            model="groq:"
-        )
-
-        assert result == "response"
-        mock_generate.assert_called_once()
-
-        # Check that default groq model was used
-        call_kwargs = mock_generate.call_args.kwargs
-        assert call_kwargs["model"] == "llama-3.1-8b-instant"
-        assert call_kwargs["base_url"] == "https://api.groq.com/openai/v1"
-        assert call_kwargs["api_key_env"] == "GROQ_API_KEY"
+    """Test OpenAI-compatible vendor prefixes (openrouter, groq, grok, cerebras)"""
+
+    def test_vendor_table_covered(self):
+        """Test every configured vendor has pinned expected defaults"""
+        assert set(OPENAI_COMPATIBLE_VENDORS) == set(_VENDOR_DEFAULTS)
+
+    @pytest.mark.parametrize("vendor", list(OPENAI_COMPATIBLE_VENDORS))
+    def test_vendor_default_model(self, openai_generate, vendor):
+        """Test an empty model after the prefix uses the vendor's default model and endpoint"""
+        default_model, base_url, api_key_env = _VENDOR_DEFAULTS[vendor]
+        _assert_openai_call(openai_generate, f"{vendor}:", default_model, base_url, api_key_env)
+
+    @pytest.mark.parametrize("model, expected_model, expected_base_url, expected_api_key_env", [
+        pytest.param("openrouter:anthropic/claude-3.5-sonnet",
+                     "anthropic/claude-3.5-sonnet", "https://openrouter.ai/api/v1", "OPENROUTER_API_KEY",
+                     id="openrouter-specific-model"),
+        pytest.param("groq:llama-3.3-70b-versatile",
+                     "llama-3.3-70b-versatile", "https://api.groq.com/openai/v1", "GROQ_API_KEY",
+                     id="groq"),
+        pytest.param("grok:grok-4-1",
+                     "grok-4-1", "https://api.x.ai/v1", "XAI_API_KEY",
+                     id="grok"),
+        # User-specified @base_url|api_key_env is not overridden by vendor defaults
+        pytest.param("openrouter:custom-model@http://custom-url/v1|MY_KEY",
+                     "custom-model", "http://custom-url/v1", "MY_KEY",
+                     id="openrouter-custom-url"),
+    ])
+    def test_vendor_config(self, openai_generate, model, expected_model, expected_base_url, expected_api_key_env):
+        """Test vendor defaults are applied unless the user specifies an endpoint"""
+        _assert_openai_call(openai_generate, model, expected_model, expected_base_url, expected_api_key_env)
 
 
 class TestOpenRouterReasoningControl:
     """Test OpenRouter-only reasoning suppression via include_thoughts"""
 
-    @patch('llm7shi.openai.generate_content')
-    def test_openrouter_disable_reasoning(self, mock_generate):
+    def test_openrouter_disable_reasoning(self, openai_generate):
         """include_thoughts=False disables reasoning for openrouter via enabled=False"""
-        mock_generate.return_value = "response"
-
         generate_with_schema(
             contents=["Test"],
             model="openrouter:anthropic/claude-3.5-sonnet",
             include_thoughts=False,
         )
 
-        call_kwargs = mock_generate.call_args.kwargs
+        call_kwargs = openai_generate.call_args.kwargs
         assert call_kwargs["extra_body"] == {"reasoning": {"enabled": False}}
 
-    @patch('llm7shi.openai.generate_content')
-    def test_openrouter_default_enables_reasoning(self, mock_generate):
+    def test_openrouter_default_enables_reasoning(self, openai_generate):
         """Default include_thoughts explicitly enables reasoning for openrouter"""
-        mock_generate.return_value = "response"
-
         generate_with_schema(
             contents=["Test"],
             model="openrouter:anthropic/claude-3.5-sonnet",
         )
 
-        call_kwargs = mock_generate.call_args.kwargs
+        call_kwargs = openai_generate.call_args.kwargs
         assert call_kwargs["extra_body"] == {"reasoning": {"enabled": True}}
 
-    @patch('llm7shi.openai.generate_content')
-    def test_groq_no_reasoning_control(self, mock_generate):
+    def test_groq_no_reasoning_control(self, openai_generate):
         """Reasoning control is openrouter-only; groq is unaffected"""
-        mock_generate.return_value = "response"
-
         generate_with_schema(
             contents=["Test"],
             model="groq:llama-3.3-70b-versatile",
             include_thoughts=False,
         )
 
-        call_kwargs = mock_generate.call_args.kwargs
+        call_kwargs = openai_generate.call_args.kwargs
         assert "extra_body" not in call_kwargs
\ No newline at end of file
@@ -1,9 +1,13 @@
-import os
+import sys
+import time
 import pytest
-from unittest.mock import patch, MagicMock, call
-from typing import Any, Dict
-import json
+from types import SimpleNamespace as NS
+from unittest.mock import Mock
 
+from google.genai import types
+from google.genai.errors import APIError
+
+from llm7shi import gemini as gemini_module
 from llm7shi.gemini import (
     Response,
     generate_content_retry,
@@ -14,15 +18,29 @@ from llm7shi.gemini import (
 )
 
 
-class MockChunk:
-    """Mock chunk for simulating Gemini API streaming responses"""
-    def __init__(self, text: str, is_thought: bool = False):
-        self.candidates = [MagicMock()]
-        self.candidates[0].content = MagicMock()
-        self.candidates[0].content.parts = [MagicMock()]
-        self.candidates[0].content.parts[0].text = text
-        self.candidates[0].content.parts[0].thought = is_thought
+def _chunk(text: str, is_thought: bool = False):
+    """Build a streamed Gemini chunk with a single text part."""
+    part = NS(text=text, thought=is_thought)
+    return NS(candidates=[NS(content=NS(parts=[part]))])
+
+
+def _api_error(code: int, message: str):
+    """Build a Gemini APIError with the given HTTP code and message."""
+    return APIError(code, {"error": {"code": code, "message": message, "details": []}})
+
+
+@pytest.fixture
+def gemini_client(monkeypatch):
+    """Replace the lazily created Gemini client with a Mock and return it."""
+    client = Mock()
+    monkeypatch.setattr(gemini_module, "_get_client", lambda: client)
+    return client
+
 
+@pytest.fixture
+def no_sleep(monkeypatch):
+    """Make retry and upload waits return immediately."""
+    monkeypatch.setattr(time, "sleep", lambda seconds: None)
 
 
 class TestResponse:
@@ -52,6 +70,18 @@ class TestResponse:
         assert "text='Hello'" in repr_str
         # Note: repr only shows contents and text, not model
 
+    def test_response_repr_message_contents(self):
+        """Test repr truncates the message text rather than the whole dict"""
+        messages = [{"role": "system", "content": "x" * 10000}]
+        response = Response(contents=messages, text="Hi")
+        assert repr(response) == "Response(contents='xxxxxxxxxx...', text='Hi')"
+
+    def test_response_repr_content_parts(self):
+        """Test repr handles message content given as a list of parts"""
+        parts = [{"type": "text", "text": "Describe"}] + [{"type": "image_url"}] * 10
+        response = Response(contents=[{"role": "user", "content": parts}], text="Hi")
+        assert repr(response) == f"Response(contents={str(parts)[:10] + '...'!r}, text='Hi')"
+
 
 class TestSchemaBuilding:
     """Test schema building functionality"""
@@ -92,16 +122,15 @@ class TestSchemaBuilding:
         assert schema.type == "ARRAY"
         assert schema.items is not None
     
-    def test_build_schema_from_json_primitives(self):
+    @pytest.mark.parametrize("json_type, expected_type", [
+        ("boolean", "BOOLEAN"),
+        ("number", "NUMBER"),
+        ("integer", "INTEGER"),
+    ])
+    def test_build_schema_from_json_primitives(self, json_type, expected_type):
         """Test building schema from primitive types"""
-        for json_type, expected_type in [
-            ("boolean", "BOOLEAN"),
-            ("number", "NUMBER"),
-            ("integer", "INTEGER")
-        ]:
-            json_schema = {"type": json_type}
-            schema = build_schema_from_json(json_schema)
-            assert schema.type == expected_type
+        schema = build_schema_from_json({"type": json_type})
+        assert schema.type == expected_type
     
     def test_build_schema_unsupported_type(self):
         """Test error handling for unsupported types"""
@@ -125,44 +154,55 @@ class TestSchemaBuilding:
 class TestGenerateContentRetry:
     """Test main content generation function"""
     
-    @patch('llm7shi.gemini._get_client')
-    def test_basic_generation(self, mock_get_client):
+    def test_basic_generation(self, gemini_client):
         """Test basic text generation"""
-        mock_stream = mock_get_client.return_value.models.generate_content_stream
+        mock_stream = gemini_client.models.generate_content_stream
         mock_chunks = [
-            MockChunk("Hello "),
-            MockChunk("World!")
+            _chunk("Hello "),
+            _chunk("World!")
         ]
-        mock_stream.return_value = iter(mock_chunks)
+        mock_stream.return_value = mock_chunks
 
         response = generate_content_retry(["Test prompt"], file=None)
 
         assert response.text == "Hello World!"
         assert response.model == "gemini-2.5-flash"
-        assert len(response.chunks) == 2
+        assert response.chunks == []  # Raw chunks are not retained by default
         mock_stream.assert_called_once()
 
-    @patch('llm7shi.gemini._get_client')
-    def test_thinking_process_extraction(self, mock_get_client):
+    def test_keep_chunks(self, gemini_client):
+        """Test raw chunks are retained when requested"""
+        mock_stream = gemini_client.models.generate_content_stream
+        mock_chunks = [
+            _chunk("Hello "),
+            _chunk("World!")
+        ]
+        mock_stream.return_value = mock_chunks
+
+        response = generate_content_retry(["Test prompt"], file=None, keep_chunks=True)
+
+        assert response.text == "Hello World!"
+        assert response.chunks == mock_chunks
+
+    def test_thinking_process_extraction(self, gemini_client):
         """Test extraction of thinking process"""
-        mock_stream = mock_get_client.return_value.models.generate_content_stream
+        mock_stream = gemini_client.models.generate_content_stream
         mock_chunks = [
-            MockChunk("I need to think...", is_thought=True),
-            MockChunk("The answer is 42", is_thought=False)
+            _chunk("I need to think...", is_thought=True),
+            _chunk("The answer is 42", is_thought=False)
         ]
-        mock_stream.return_value = iter(mock_chunks)
+        mock_stream.return_value = mock_chunks
 
         response = generate_content_retry(["What is the answer?"], file=None)
 
         assert response.thoughts == "I need to think..."
         assert response.text == "The answer is 42"
 
-    @patch('llm7shi.gemini._get_client')
-    def test_custom_model(self, mock_get_client):
+    def test_custom_model(self, gemini_client):
         """Test custom model parameter"""
-        mock_stream = mock_get_client.return_value.models.generate_content_stream
-        mock_chunks = [MockChunk("Response")]
-        mock_stream.return_value = iter(mock_chunks)
+        mock_stream = gemini_client.models.generate_content_stream
+        mock_chunks = [_chunk("Response")]
+        mock_stream.return_value = mock_chunks
 
         response = generate_content_retry(
             ["Test"],
@@ -175,12 +215,11 @@ class TestGenerateContentRetry:
         call_args = mock_stream.call_args
         assert call_args[1]['model'] == "gemini-2.5-pro"
 
-    @patch('llm7shi.gemini._get_client')
-    def test_thinking_budget_parameter(self, mock_get_client):
+    def test_thinking_budget_parameter(self, gemini_client):
         """Test thinking budget parameter"""
-        mock_stream = mock_get_client.return_value.models.generate_content_stream
-        mock_chunks = [MockChunk("Response")]
-        mock_stream.return_value = iter(mock_chunks)
+        mock_stream = gemini_client.models.generate_content_stream
+        mock_chunks = [_chunk("Response")]
+        mock_stream.return_value = mock_chunks
 
         response = generate_content_retry(
             ["Test"],
@@ -191,14 +230,12 @@ class TestGenerateContentRetry:
         call_args = mock_stream.call_args
         assert call_args[1]['config'].thinking_config.thinking_budget == 50000
 
-    @patch('llm7shi.gemini._get_client')
-    def test_with_config(self, mock_get_client):
+    def test_with_config(self, gemini_client):
         """Test generation with config parameter"""
-        mock_stream = mock_get_client.return_value.models.generate_content_stream
-        mock_chunks = [MockChunk('{"result": "test"}')]
-        mock_stream.return_value = iter(mock_chunks)
+        mock_stream = gemini_client.models.generate_content_stream
+        mock_chunks = [_chunk('{"result": "test"}')]
+        mock_stream.return_value = mock_chunks
 
-        from google.genai import types
         config = types.GenerateContentConfig(response_mime_type="application/json")
         response = generate_content_retry(
             ["Test"],
@@ -212,69 +249,72 @@ class TestGenerateContentRetry:
         assert passed_config.response_mime_type == "application/json"
         assert passed_config.thinking_config is not None
 
-    @patch('llm7shi.gemini._get_client')
-    @patch('time.sleep')
-    @patch('builtins.print')  # Mock print to avoid stderr output
-    def test_retry_logic_429(self, mock_print, mock_sleep, mock_get_client):
+    def test_retry_logic_429(self, no_sleep, gemini_client, capsys):
         """Test retry logic for 429 errors"""
-        mock_stream = mock_get_client.return_value.models.generate_content_stream
+        mock_stream = gemini_client.models.generate_content_stream
         # Mock a 429 error followed by success
-        from google.genai.errors import APIError
-        error_429 = APIError("Rate limit exceeded", {"error": {"details": []}})
-        error_429.code = 429
+        error_429 = _api_error(429, "Rate limit exceeded")
 
-        mock_chunks = [MockChunk("Success after retry")]
+        mock_chunks = [_chunk("Success after retry")]
 
         # First call raises 429, second succeeds
-        mock_stream.side_effect = [error_429, iter(mock_chunks)]
+        mock_stream.side_effect = [error_429, mock_chunks]
 
         response = generate_content_retry(["Test"], file=None)
 
         assert response.text == "Success after retry"
         assert mock_stream.call_count == 2
+        err = capsys.readouterr().err
+        assert "Rate limit exceeded" in err
+        assert "Retrying..." in err
 
-    @patch('llm7shi.gemini._get_client')
-    @patch('time.sleep')
-    @patch('builtins.print')  # Mock print to avoid stderr output
-    def test_retry_logic_server_errors(self, mock_print, mock_sleep, mock_get_client):
-        """Test retry logic for server errors (500, 502, 503)"""
-        mock_stream = mock_get_client.return_value.models.generate_content_stream
-        from google.genai.errors import APIError
+    def test_retry_shows_partial_output_first(self, no_sleep, gemini_client, capsys):
+        """Test output held before a mid-stream error is shown before retrying"""
+        mock_stream = gemini_client.models.generate_content_stream
+
+        def failing_stream():
+            yield _chunk("partial")
+            raise _api_error(503, "Server error 503")
 
-        for error_code in [500, 502, 503]:
-            mock_sleep.reset_mock()
-            mock_stream.reset_mock()
-            mock_print.reset_mock()
+        mock_stream.side_effect = [failing_stream(), [_chunk("Success")]]
 
-            error = APIError(f"Server error {error_code}", {"error": {"details": []}})
-            error.code = error_code
+        response = generate_content_retry(["Test"], show_params=False, file=sys.stdout)
 
-            mock_chunks = [MockChunk(f"Success after {error_code}")]
-            mock_stream.side_effect = [error, iter(mock_chunks)]
+        assert response.text == "Success"
+        # Shown as it was streamed; only the successful attempt is finalized
+        assert capsys.readouterr().out == "partialSuccess\n"
 
-            response = generate_content_retry(["Test"], file=None)
+    @pytest.mark.parametrize("error_code", [500, 502, 503])
+    def test_retry_logic_server_errors(self, no_sleep, gemini_client, capsys, error_code):
+        """Test retry logic for server errors (500, 502, 503)"""
+        mock_stream = gemini_client.models.generate_content_stream
+        error = _api_error(error_code, f"Server error {error_code}")
+
+        mock_chunks = [_chunk(f"Success after {error_code}")]
+        mock_stream.side_effect = [error, mock_chunks]
 
-            assert response.text == f"Success after {error_code}"
-            assert mock_stream.call_count == 2
+        response = generate_content_retry(["Test"], file=None)
+
+        assert response.text == f"Success after {error_code}"
+        assert mock_stream.call_count == 2
+        assert f"Server error {error_code}" in capsys.readouterr().err
 
 
 class TestFileOperations:
     """Test file upload and delete operations"""
     
-    @patch('llm7shi.gemini._get_client')
-    @patch('time.sleep')
-    def test_upload_file_success(self, mock_sleep, mock_get_client):
+    def test_upload_file_success(self, no_sleep, gemini_client):
         """Test successful file upload with processing wait"""
-        mock_upload = mock_get_client.return_value.files.upload
-        mock_get = mock_get_client.return_value.files.get
+        mock_upload = gemini_client.files.upload
+        mock_get = gemini_client.files.get
         # Mock upload response - initially PROCESSING
-        mock_file = MagicMock()
+        mock_file = Mock()
         mock_file.name = "files/test123"
         mock_file.state.name = "PROCESSING"  # Initial state after upload
         mock_upload.return_value = mock_file
 
         # Mock processing states: first processing, then active
-        mock_active = MagicMock()
+        mock_active = Mock()
         mock_active.state.name = "ACTIVE"
 
         mock_get.side_effect = [mock_active]
@@ -284,17 +324,17 @@ class TestFileOperations:
         assert result == mock_active  # Returns the final state
         # Check the actual call structure with UploadFileConfig
         mock_upload.assert_called_once()
-        call_args = mock_upload.call_args
-        assert call_args[1]['file'] == "test.txt"
-        assert call_args[1]['config'].mime_type == "text/plain"
-        assert call_args[1]['config'].display_name == "test.txt"
+        kwargs = mock_upload.call_args.kwargs
+        assert kwargs['file'] == "test.txt"
+        config = kwargs['config']
+        assert config.mime_type == "text/plain"
+        assert config.display_name == "test.txt"
 
-    @patch('llm7shi.gemini._get_client')
-    def test_delete_file_success(self, mock_get_client):
+    def test_delete_file_success(self, gemini_client):
         """Test successful file deletion"""
-        mock_delete = mock_get_client.return_value.files.delete
+        mock_delete = gemini_client.files.delete
         # Create a mock file object with name attribute
-        mock_file = MagicMock()
+        mock_file = Mock()
         mock_file.name = "files/test123"
 
         delete_file(mock_file)
@@ -305,15 +345,13 @@ class TestFileOperations:
 class TestBackwardCompatibility:
     """Test backward compatibility functions"""
     
-    @patch('llm7shi.gemini.generate_content_retry')
-    def test_legacy_function_wrapper(self, mock_generate):
+    def test_legacy_function_wrapper(self, monkeypatch):
         """Test that legacy function names still work"""
-        mock_response = Response(text="Legacy response")
-        mock_generate.return_value = mock_response
+        mock_generate = Mock(return_value=Response(text="Legacy response"))
+        monkeypatch.setattr(gemini_module, "generate_content_retry", mock_generate)
         
-        # Test that the new function is called with correct parameters
-        from llm7shi.gemini import generate_content_retry as legacy_func
-        result = legacy_func(["Test"])
+        # Look the function up on the module so the patched attribute is used
+        result = gemini_module.generate_content_retry(["Test"])
         
         assert result.text == "Legacy response"
         mock_generate.assert_called_once()
\ No newline at end of file
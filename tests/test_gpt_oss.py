@@ -1,288 +1,173 @@
 """Tests for gpt-oss template filter."""
 
 import pytest
-from unittest.mock import patch, MagicMock
+from types import SimpleNamespace as NS
+from unittest.mock import patch, Mock
 from llm7shi.monitor import GptOssTemplateFilter
+from llm7shi import openai as openai_module
 from llm7shi.openai import generate_content
 
+# Raw gpt-oss template output streamed one token per chunk
+_GPT_OSS_TEMPLATE_TEXTS = (
+    '<|channel|>', 'analysis', '<|message|>', 'Thinking...',
+    '<|channel|>', 'final', '<|message|>', 'Hello!',
+)
 
-def test_basic_channel_switching():
-    """Test basic channel switching between analysis and final."""
-    filter = GptOssTemplateFilter()
 
-    # Analysis channel
-    output = filter.feed('<|channel|>')
-    assert output == ''
+def _chunk(content=None, reasoning=None):
+    """Build a streamed OpenAI chunk with optional content/reasoning."""
+    return NS(choices=[NS(delta=NS(content=content, reasoning=reasoning))])
 
-    output = filter.feed('analysis')
-    assert output == ''
 
-    output = filter.feed('<|message|>')
-    assert output == ''
+def _feed_all(gpt_filter, *chunks):
+    """Feed chunks in order and return the concatenated display output."""
+    return ''.join([gpt_filter.feed(chunk) for chunk in chunks])
 
-    output = filter.feed('This is analysis.')
-    assert output == ''
-    assert filter.thoughts == 'This is analysis.'
 
-    # Switch to final channel
-    output = filter.feed('<|channel|>')
-    assert output == ''
+@pytest.fixture
+def gpt_filter():
+    """Fresh GptOssTemplateFilter for each test."""
+    return GptOssTemplateFilter()
 
-    output = filter.feed('final')
-    assert output == ''
 
-    output = filter.feed('<|message|>')
-    assert output == ''
+def test_basic_channel_switching(gpt_filter):
+    """Test basic channel switching between analysis and final."""
+    # Analysis channel
+    assert _feed_all(gpt_filter, '<|channel|>', 'analysis', '<|message|>', 'This is analysis.') == ''
+    assert gpt_filter.thoughts == 'This is analysis.'
+
+    # Switch to final channel
+    assert _feed_all(gpt_filter, '<|channel|>', 'final', '<|message|>') == ''
 
-    output = filter.feed('This is final.')
+    output = gpt_filter.feed('This is final.')
     assert output == 'This is final.'
-    assert filter.text == 'This is final.'
-
-
-def test_multiple_chunks():
-    """Test processing content split into multiple chunks."""
-    filter = GptOssTemplateFilter()
-
-    chunks = [
-        '<|channel|>',
-        'analysis',
-        '<|message|>',
-        'The',
-        ' user',
-        ' wants',
-        ' greeting',
-        '<|channel|>',
-        'final',
-        '<|message|>',
-        'Hello',
-        '!',
-    ]
-
-    output_parts = []
-    for chunk in chunks:
-        output = filter.feed(chunk)
-        if output:
-            output_parts.append(output)
-
-    assert filter.thoughts == 'The user wants greeting'
-    assert filter.text == 'Hello!'
-    assert ''.join(output_parts) == 'Hello!'
-
-
-def test_start_token_with_role():
+    assert gpt_filter.text == 'This is final.'
+
+
+@pytest.mark.parametrize("chunks, expected_thoughts, expected_text", [
+    # Content split into many small chunks
+    pytest.param(
+        ['<|channel|>', 'analysis', '<|message|>', 'The', ' user', ' wants', ' greeting',
+         '<|channel|>', 'final', '<|message|>', 'Hello', '!'],
+        'The user wants greeting', 'Hello!', id="multiple-chunks"),
+    # <|channel|> split across two chunks
+    pytest.param(['<|chan', 'nel|>', 'analysis', 'text'],
+                 'text', '', id="control-token-across-chunks"),
+    # Real gpt-oss output with <|start|>assistant between channels
+    pytest.param(
+        ['<|channel|>', 'analysis', '<|message|>', 'User asks for greeting. ', 'Should respond politely.',
+         '<|start|>', 'assistant', '<|channel|>', 'final', '<|message|>', 'Hello! ', 'How can I help you?'],
+        'User asks for greeting. Should respond politely.', 'Hello! How can I help you?',
+        id="complex-scenario"),
+    # <|end|> is filtered
+    pytest.param(['<|channel|>', 'final', '<|message|>', 'Hello', '<|end|>'],
+                 '', 'Hello', id="end-token"),
+    # Role names other than assistant are discarded too
+    pytest.param(['<|start|>', 'user', '<|channel|>', 'final', 'Hi'],
+                 '', 'Hi', id="user-role"),
+    pytest.param(['<|start|>', 'system', '<|message|>', 'Test'],
+                 '', 'Test', id="system-role"),
+    # Role name split across chunks
+    pytest.param(['<|start|>', 'ass', 'istant', '<|channel|>', 'final', 'text'],
+                 '', 'text', id="partial-role-name"),
+])
+def test_chunk_sequences(gpt_filter, chunks, expected_thoughts, expected_text):
+    """Test a sequence of feeds is split into thoughts and text."""
+    output = _feed_all(gpt_filter, *chunks)
+
+    assert gpt_filter.thoughts == expected_thoughts
+    assert gpt_filter.text == expected_text
+    assert output == expected_text
+
+
+def test_start_token_with_role(gpt_filter):
     """Test <|start|> token followed by role name."""
-    filter = GptOssTemplateFilter()
+    assert _feed_all(gpt_filter, '<|start|>', 'assistant', '<|channel|>', 'final', '<|message|>') == ''
 
-    output = filter.feed('<|start|>')
-    assert output == ''
-
-    output = filter.feed('assistant')
-    assert output == ''
-
-    output = filter.feed('<|channel|>')
-    assert output == ''
-
-    output = filter.feed('final')
-    assert output == ''
-
-    output = filter.feed('<|message|>')
-    assert output == ''
-
-    output = filter.feed('Hello')
+    output = gpt_filter.feed('Hello')
     assert output == 'Hello'
-    assert filter.text == 'Hello'
+    assert gpt_filter.text == 'Hello'
 
 
-def test_no_channel_defaults_to_text():
+def test_no_channel_defaults_to_text(gpt_filter):
     """Test that content without channel goes to text."""
-    filter = GptOssTemplateFilter()
-
-    output = filter.feed('Direct text')
+    output = gpt_filter.feed('Direct text')
     assert output == 'Direct text'
-    assert filter.text == 'Direct text'
-    assert filter.thoughts == ''
-
-
-def test_control_token_across_chunks():
-    """Test control token split across multiple chunks."""
-    filter = GptOssTemplateFilter()
+    assert gpt_filter.text == 'Direct text'
+    assert gpt_filter.thoughts == ''
 
-    # Split <|channel|> token
-    output = filter.feed('<|chan')
-    assert output == ''
-
-    output = filter.feed('nel|>')
-    assert output == ''
-
-    output = filter.feed('analysis')
-    assert output == ''
-
-    output = filter.feed('text')
-    assert output == ''
-    assert filter.thoughts == 'text'
 
-
-def test_flush():
+def test_flush(gpt_filter):
     """Test flushing remaining buffer."""
-    filter = GptOssTemplateFilter()
-
     # Set to final channel
-    filter.feed('<|channel|>')
-    filter.feed('final')
-    filter.feed('<|message|>')
+    _feed_all(gpt_filter, '<|channel|>', 'final', '<|message|>')
 
     # Add content but keep some in buffer
-    filter.feed('Hello <|')
+    gpt_filter.feed('Hello <|')
 
     # Flush should output remaining content
-    remaining = filter.flush()
+    remaining = gpt_filter.flush()
     assert remaining == '<|'
-    assert filter.text == 'Hello <|'
-
-
-def test_complex_scenario():
-    """Test complex real-world scenario."""
-    filter = GptOssTemplateFilter()
-
-    # Simulate real gpt-oss output
-    chunks = [
-        '<|channel|>',
-        'analysis',
-        '<|message|>',
-        'User asks for greeting. ',
-        'Should respond politely.',
-        '<|start|>',
-        'assistant',
-        '<|channel|>',
-        'final',
-        '<|message|>',
-        'Hello! ',
-        'How can I help you?',
-    ]
-
-    final_output = []
-    for chunk in chunks:
-        output = filter.feed(chunk)
-        if output:
-            final_output.append(output)
-
-    assert filter.thoughts == 'User asks for greeting. Should respond politely.'
-    assert filter.text == 'Hello! How can I help you?'
-    assert ''.join(final_output) == 'Hello! How can I help you?'
-
-
-def test_end_token():
-    """Test <|end|> token is properly filtered."""
-    filter = GptOssTemplateFilter()
-
-    filter.feed('<|channel|>')
-    filter.feed('final')
-    filter.feed('<|message|>')
-    filter.feed('Hello')
-
-    output = filter.feed('<|end|>')
-    assert output == ''
-    assert filter.text == 'Hello'
-
-
-def test_multiple_roles():
-    """Test different role names (user, system, assistant)."""
-    filter = GptOssTemplateFilter()
-
-    # Test 'user' role
-    filter.feed('<|start|>')
-    filter.feed('user')
-    filter.feed('<|channel|>')
-    filter.feed('final')
-    filter.feed('Hi')
-
-    assert filter.text == 'Hi'
+    assert gpt_filter.text == 'Hello <|'
 
-    # Test 'system' role
-    filter2 = GptOssTemplateFilter()
-    filter2.feed('<|start|>')
-    filter2.feed('system')
-    filter2.feed('<|message|>')
-    filter2.feed('Test')
 
-    assert filter2.text == 'Test'
+def test_feed_delta(gpt_filter):
+    """Test that feed_delta/flush_delta return only newly appended fragments."""
+    for token in ['<|channel|>', 'analysis', '<|message|>']:
+        assert gpt_filter.feed_delta(token) == ('', '')
+    assert gpt_filter.feed_delta('Think') == ('Think', '')
+    assert gpt_filter.feed_delta('ing') == ('ing', '')
+    for token in ['<|channel|>', 'final', '<|message|>']:
+        assert gpt_filter.feed_delta(token) == ('', '')
+    assert gpt_filter.feed_delta('Hi there<|') == ('', 'Hi there')
+    assert gpt_filter.flush_delta() == ('', '<|')
+    assert gpt_filter.flush_delta() == ('', '')
 
+    assert gpt_filter.thoughts == 'Thinking'
+    assert gpt_filter.text == 'Hi there<|'
 
-def test_partial_role_name():
-    """Test partial role name in buffer."""
-    filter = GptOssTemplateFilter()
 
-    filter.feed('<|start|>')
-    filter.feed('ass')  # Partial 'assistant'
-    filter.feed('istant')
-    filter.feed('<|channel|>')
-    filter.feed('final')
-    filter.feed('text')
-
-    assert filter.text == 'text'
-
-
-def test_empty_chunks():
+def test_empty_chunks(gpt_filter):
     """Test handling of empty chunks."""
-    filter = GptOssTemplateFilter()
-
-    output = filter.feed('')
+    output = gpt_filter.feed('')
     assert output == ''
 
-    filter.feed('<|channel|>')
-    filter.feed('final')
+    _feed_all(gpt_filter, '<|channel|>', 'final')
 
-    output = filter.feed('')
+    output = gpt_filter.feed('')
     assert output == ''
 
-    filter.feed('text')
-    assert filter.text == 'text'
+    gpt_filter.feed('text')
+    assert gpt_filter.text == 'text'
 
 
-def test_long_content():
+@pytest.mark.parametrize("reps", [10, 100, 1000])
+def test_long_content(gpt_filter, reps):
     """Test with longer content in each channel."""
-    filter = GptOssTemplateFilter()
+    analysis_text = "This is a detailed analysis. " * reps
+    final_text = "This is the final response. " * reps
 
-    analysis_text = "This is a detailed analysis. " * 10
-    final_text = "This is the final response. " * 10
+    _feed_all(gpt_filter, '<|channel|>', 'analysis', '<|message|>', analysis_text)
+    output = _feed_all(gpt_filter, '<|channel|>', 'final', '<|message|>', final_text)
 
-    filter.feed('<|channel|>')
-    filter.feed('analysis')
-    filter.feed('<|message|>')
-    filter.feed(analysis_text)
-
-    filter.feed('<|channel|>')
-    filter.feed('final')
-    filter.feed('<|message|>')
-    output = filter.feed(final_text)
-
-    assert filter.thoughts == analysis_text
-    assert filter.text == final_text
+    assert gpt_filter.thoughts == analysis_text
+    assert gpt_filter.text == final_text
     assert output == final_text
 
 
 class TestFilterActivation:
     """Test filter activation based on model name."""
 
-    @patch('llm7shi.openai.OpenAI')
+    @patch.object(openai_module, "OpenAI")
     def test_filter_activates_for_llama_cpp_gpt_oss(self, mock_openai_class):
         """Test that filter activates for model name 'llama.cpp/gpt-oss'."""
         # Mock OpenAI client
-        mock_client = MagicMock()
+        mock_client = Mock()
         mock_openai_class.return_value = mock_client
 
         # Simulate gpt-oss template output
-        mock_chunks = [
-            self._create_chunk('<|channel|>'),
-            self._create_chunk('analysis'),
-            self._create_chunk('<|message|>'),
-            self._create_chunk('Thinking...'),
-            self._create_chunk('<|channel|>'),
-            self._create_chunk('final'),
-            self._create_chunk('<|message|>'),
-            self._create_chunk('Hello!'),
-        ]
-        mock_client.chat.completions.create.return_value = iter(mock_chunks)
+        mock_chunks = [_chunk(text) for text in _GPT_OSS_TEMPLATE_TEXTS]
+        mock_client.chat.completions.create.return_value = mock_chunks
 
         # Call with llama.cpp/gpt-oss model
         result = generate_content(
@@ -297,25 +182,16 @@ class TestFilterActivation:
         assert '<|channel|>' not in result.text
         assert '<|message|>' not in result.text
 
-    @patch('llm7shi.openai.OpenAI')
+    @patch.object(openai_module, "OpenAI")
     def test_filter_does_not_activate_for_other_models(self, mock_openai_class):
         """Test that filter does NOT activate for other model names."""
         # Mock OpenAI client
-        mock_client = MagicMock()
+        mock_client = Mock()
         mock_openai_class.return_value = mock_client
 
-        # Simulate gpt-oss template output (same as above)
-        mock_chunks = [
-            self._create_chunk('<|channel|>'),
-            self._create_chunk('analysis'),
-            self._create_chunk('<|message|>'),
-            self._create_chunk('Thinking...'),
-            self._create_chunk('<|channel|>'),
-            self._create_chunk('final'),
-            self._create_chunk('<|message|>'),
-            self._create_chunk('Hello!'),
-        ]
-        mock_client.chat.completions.create.return_value = iter(mock_chunks)
+        # Simulate gpt-oss template output
+        mock_chunks = [_chunk(text) for text in _GPT_OSS_TEMPLATE_TEXTS]
+        mock_client.chat.completions.create.return_value = mock_chunks
 
         # Call with different model name
         result = generate_content(
@@ -331,19 +207,19 @@ class TestFilterActivation:
         assert 'Thinking...' in result.text
         assert 'Hello!' in result.text
 
-    @patch('llm7shi.openai.OpenAI')
+    @patch.object(openai_module, "OpenAI")
     def test_filter_does_not_activate_for_standard_models(self, mock_openai_class):
         """Test that filter does NOT activate for standard OpenAI models."""
         # Mock OpenAI client
-        mock_client = MagicMock()
+        mock_client = Mock()
         mock_openai_class.return_value = mock_client
 
         # Normal OpenAI response without control tokens
         mock_chunks = [
-            self._create_chunk('Hello,'),
-            self._create_chunk(' world!'),
+            _chunk('Hello,'),
+            _chunk(' world!'),
         ]
-        mock_client.chat.completions.create.return_value = iter(mock_chunks)
+        mock_client.chat.completions.create.return_value = mock_chunks
 
         # Call with standard model name
         result = generate_content(
@@ -356,32 +232,23 @@ class TestFilterActivation:
         assert result.thoughts == ''
         assert result.text == 'Hello, world!'
 
-    def _create_chunk(self, content):
-        """Helper to create a mock chunk."""
-        chunk = MagicMock()
-        chunk.choices = [MagicMock()]
-        chunk.choices[0].delta = MagicMock()
-        chunk.choices[0].delta.content = content
-        chunk.choices[0].delta.reasoning = None
-        return chunk
-
 
 class TestReasoningExtraction:
     """Test reasoning extraction from delta.reasoning (OpenRouter / reasoning models)."""
 
-    @patch('llm7shi.openai.OpenAI')
+    @patch.object(openai_module, "OpenAI")
     def test_reasoning_separated_from_content(self, mock_openai_class):
         """delta.reasoning is collected into thoughts, content into text."""
-        mock_client = MagicMock()
+        mock_client = Mock()
         mock_openai_class.return_value = mock_client
 
         mock_chunks = [
-            self._create_chunk(reasoning="Let me "),
-            self._create_chunk(reasoning="think."),
-            self._create_chunk(content="Hello"),
-            self._create_chunk(content="!"),
+            _chunk(reasoning="Let me "),
+            _chunk(reasoning="think."),
+            _chunk(content="Hello"),
+            _chunk(content="!"),
         ]
-        mock_client.chat.completions.create.return_value = iter(mock_chunks)
+        mock_client.chat.completions.create.return_value = mock_chunks
 
         result = generate_content(
             messages=[{"role": "user", "content": "Test"}],
@@ -392,17 +259,17 @@ class TestReasoningExtraction:
         assert result.thoughts == "Let me think."
         assert result.text == "Hello!"
 
-    @patch('llm7shi.openai.OpenAI')
+    @patch.object(openai_module, "OpenAI")
     def test_no_reasoning_leaves_thoughts_empty(self, mock_openai_class):
         """Without delta.reasoning, thoughts stays empty."""
-        mock_client = MagicMock()
+        mock_client = Mock()
         mock_openai_class.return_value = mock_client
 
         mock_chunks = [
-            self._create_chunk(content="Hello, "),
-            self._create_chunk(content="world!"),
+            _chunk(content="Hello, "),
+            _chunk(content="world!"),
         ]
-        mock_client.chat.completions.create.return_value = iter(mock_chunks)
+        mock_client.chat.completions.create.return_value = mock_chunks
 
         result = generate_content(
             messages=[{"role": "user", "content": "Test"}],
@@ -412,12 +279,3 @@ class TestReasoningExtraction:
 
         assert result.thoughts == ""
         assert result.text == "Hello, world!"
-
-    def _create_chunk(self, content=None, reasoning=None):
-        """Helper to create a mock chunk with optional content/reasoning."""
-        chunk = MagicMock()
-        chunk.choices = [MagicMock()]
-        chunk.choices[0].delta = MagicMock()
-        chunk.choices[0].delta.content = content
-        chunk.choices[0].delta.reasoning = reasoning
-        return chunk
@@ -1,5 +1,5 @@
 import pytest
-from llm7shi.monitor import detect_repetition
+from llm7shi.monitor import detect_repetition, _REQUIRED_REPS_TABLE, _calculate_required_reps, _check_quasi_repetition
 
 
 def test_detect_repetition_basic():
@@ -131,6 +131,24 @@ def test_detect_repetition_formula():
     assert detect_repetition(pattern40 * 19 + "different") == False
 
 
+def test_required_reps_table():
+    """Test the required repetitions table precomputed at import."""
+    assert isinstance(_REQUIRED_REPS_TABLE, tuple)
+    assert _REQUIRED_REPS_TABLE[1:] == (
+        340, 170, 114, 86, 69, 58, 50, 44, 40, 36,
+        33, 31, 29, 27, 26, 25, 24, 23, 22, 21,
+    )
+
+    # Total characters required never decreases (enables early termination)
+    totals = [n * _REQUIRED_REPS_TABLE[n] for n in range(1, 21)]
+    assert totals == sorted(totals)
+
+    # Lookup and fixed value for longer patterns
+    assert _calculate_required_reps(5) == 69
+    assert _calculate_required_reps(21) == 20
+    assert _calculate_required_reps(500) == 20
+
+
 def test_detect_quasi_repetition_basic():
     """Test quasi-repetition detection with gaps shorter than pattern."""
     # Pattern "foo" (3 chars) with single-char gaps
@@ -180,6 +198,14 @@ def test_detect_quasi_repetition_gap_boundary():
     assert detect_repetition(text) == False
 
 
+def test_quasi_repetition_chain_breaks_at_long_gap():
+    """Test a gap as long as the pattern ends the chain despite earlier repeats."""
+    # Earlier occurrences lie beyond the gap, so they cannot continue the chain
+    assert _check_quasi_repetition("abc" * 200 + "XYZ" + "abc", "abc", 114) == False
+    # A gap one shorter than the pattern keeps the chain going
+    assert _check_quasi_repetition("abc" * 200 + "XY" + "abc", "abc", 114) == True
+
+
 def test_detect_quasi_repetition_not_enough_reps():
     """Test that quasi-repetition requires enough repetitions."""
     # Pattern "foo" (3 chars) needs 114 reps, but only 10
@@ -3,7 +3,7 @@ import re
 
 import pytest
 
-from llm7shi.monitor import StreamProcessor
+from llm7shi.monitor import StreamProcessor, TokenWriter
 
 
 def _strip_ansi(text):
@@ -142,3 +142,71 @@ def test_file_none_accumulates_without_error():
     processor.finalize()
     assert processor.thoughts == "thought"
     assert processor.text == "answer"
+
+
+class _CountingFile(io.StringIO):
+    """StringIO that records how often it is flushed."""
+
+    def __init__(self):
+        super().__init__()
+        self.flushes = 0
+
+    def flush(self):
+        self.flushes += 1
+        super().flush()
+
+
+def test_token_writer_batches_until_newline():
+    """Fragments are held until a newline arrives, then written at once."""
+    out = _CountingFile()
+    writer = TokenWriter(out, max_delay=3600)
+    writer.write("Hello")
+    writer.write(", ")
+    assert out.getvalue() == "" and out.flushes == 0
+    writer.write("world\n")
+    assert out.getvalue() == "Hello, world\n" and out.flushes == 1
+
+
+def test_token_writer_flushes_on_size():
+    """A long line without newlines is still flushed once the buffer fills."""
+    out = _CountingFile()
+    writer = TokenWriter(out, max_chars=8, max_delay=3600)
+    writer.write("abcd")
+    assert out.getvalue() == ""
+    writer.write("efgh")
+    assert out.getvalue() == "abcdefgh"
+
+
+def test_finalize_flushes_partial_line():
+    """finalize() writes out any fragment still held by the writer."""
+    out = _CountingFile()
+    processor = StreamProcessor(file=out)
+    processor._writer.max_delay = 3600
+    processor.add_text("partial")
+    processor.finalize()
+    assert out.getvalue() == "partial\n"
+
+
+class _BrokenFile(io.StringIO):
+    """StringIO whose writes fail, like stdout after a broken pipe."""
+
+    def write(self, s):
+        raise BrokenPipeError
+
+
+def test_abort_flushes_without_newline():
+    """abort() shows a held fragment as-is, without finalize()'s newline."""
+    out = _CountingFile()
+    processor = StreamProcessor(file=out)
+    processor._writer.max_delay = 3600
+    processor.add_text("partial")
+    processor.abort()
+    assert out.getvalue() == "partial"
+
+
+def test_abort_ignores_failing_file():
+    """abort() never raises, so it cannot replace the error being handled."""
+    processor = StreamProcessor(file=_BrokenFile())
+    processor._writer.max_delay = 3600
+    processor.add_text("partial")
+    processor.abort()
@@ -45,6 +45,11 @@ def test_calculate_trailing_whitespace_weight_edge_cases():
     # Empty and no whitespace
     assert _calculate_trailing_whitespace_weight("") == 0
     assert _calculate_trailing_whitespace_weight("text") == 0
+    assert _calculate_trailing_whitespace_weight("text  \n\tmore") == 0
+
+    # Other Unicode whitespace (weight 1, same as rstrip())
+    assert _calculate_trailing_whitespace_weight("text\u3000") == 1
+    assert _calculate_trailing_whitespace_weight("text\n\u3000") == 9  # 2 + 1*7
 
     # Only whitespace
     assert _calculate_trailing_whitespace_weight("   ") == 3
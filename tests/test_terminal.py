@@ -357,6 +357,16 @@ class TestMarkdownStreamConverter:
         assert result == "Just plain text"
         assert converter.buffer == ""
     
+    def test_converter_plain_chunks_keep_line_state(self):
+        """Marker-free chunks pass through unchanged but still track blank lines"""
+        converter = MarkdownStreamConverter()
+        out = converter.feed("**bold")
+        out += converter.feed(" text")  # plain chunk inside active bold
+        assert out == BOLD_ON + "bold text"
+        out += converter.feed("\n   ")  # plain chunk ending in a whitespace-only line
+        out += converter.feed("\n")    # completes a blank line: bold is reset
+        assert out == BOLD_ON + "bold text\n   " + INLINE_OFF + "\n"
+
     def test_converter_empty_input(self):
         """Test converter with empty input"""
         converter = MarkdownStreamConverter()
@@ -1,7 +1,6 @@
 import pytest
-from unittest.mock import patch, MagicMock, mock_open
+from unittest.mock import patch, MagicMock
 from io import StringIO
-import json
 
 from llm7shi.utils import (
     do_show_params,
@@ -88,6 +87,27 @@ class TestDoShowParams:
         assert "test-model" in written_content
 
 
+    def test_show_params_single_write(self):
+        """Test the whole parameter block is written with one call"""
+        mock_file = MagicMock()
+        contents = [
+            {"role": "system", "content": "Be brief"},
+            {"role": "user", "content": "Line 1\nLine 2"},
+        ]
+
+        do_show_params(contents, model="m", temperature=0.5, file=mock_file)
+
+        mock_file.write.assert_called_once_with(
+            "- model      : m\n"
+            "- temperature: 0.5\n"
+            "\n> [system]\n"
+            "> Be brief\n"
+            "\n> [user]\n"
+            "> Line 1\n"
+            "> Line 2\n"
+            "\n"
+        )
+
 class TestContentsToOpenaiMessages:
     """Test OpenAI message format conversion"""
     
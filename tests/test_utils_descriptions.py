@@ -187,6 +187,25 @@ class TestCreateJsonDescriptionsPrompt:
         expected = "Please extract information to the following JSON fields.\n- temperature: Temperature in Celsius"
         assert result == expected
     
+    def test_pydantic_model_prompt_cached(self):
+        """Test the Pydantic schema is generated only once per model class"""
+        class Cached(BaseModel):
+            name: str = Field(description="Item name")
+
+        calls = []
+        original = Cached.model_json_schema
+
+        def counting_schema(*args, **kwargs):
+            calls.append(1)
+            return original(*args, **kwargs)
+
+        Cached.model_json_schema = counting_schema
+        first = create_json_descriptions_prompt(Cached)
+        second = create_json_descriptions_prompt(Cached)
+
+        assert first == second == "Please extract information to the following JSON fields.\n- name: Item name"
+        assert len(calls) == 1
+
     def test_nested_pydantic_model(self):
         """Test prompt generation from nested Pydantic model"""
         class LocationTemperature(BaseModel):
@@ -3,6 +3,8 @@ import pytest
 from llm7shi.utils import (
     add_additional_properties_false,
     inline_defs,
+    extract_descriptions,
+    prepare_schema,
 )
 
 
@@ -109,6 +111,26 @@ class TestAddAdditionalPropertiesFalse:
         assert result["properties"]["level1"]["additionalProperties"] is False
         assert result["properties"]["level1"]["properties"]["level2"]["additionalProperties"] is False
 
+    def test_objects_inside_lists(self):
+        """Test objects in anyOf branches also get additionalProperties: false"""
+        schema = {
+            "type": "object",
+            "properties": {
+                "value": {
+                    "anyOf": [
+                        {"type": "object", "properties": {"x": {"type": "integer"}}},
+                        {"type": "null"}
+                    ]
+                }
+            }
+        }
+
+        result = add_additional_properties_false(schema)
+
+        assert result["properties"]["value"]["anyOf"][0]["additionalProperties"] is False
+        assert "additionalProperties" not in result["properties"]["value"]["anyOf"][1]
+        assert "additionalProperties" not in schema["properties"]["value"]["anyOf"][0]
+
 
 class TestInlineDefs:
     """Test schema reference inlining"""
@@ -244,6 +266,22 @@ class TestInlineDefs:
         assert "title" not in result
         assert "title" not in result["properties"]["user"]
         assert "title" not in result["properties"]["user"]["properties"]["name"]
+
+    def test_property_named_title_kept(self):
+        """Test a property called "title" is not removed with title keywords"""
+        schema = {
+            "type": "object",
+            "title": "Article",
+            "properties": {
+                "title": {"type": "string", "title": "Title"}
+            },
+            "required": ["title"]
+        }
+
+        result = inline_defs(schema)
+
+        assert result["properties"] == {"title": {"type": "string"}}
+        assert result["required"] == ["title"]
     
     def test_circular_references(self):
         """Test handling of circular references"""
@@ -269,3 +307,131 @@ class TestInlineDefs:
             inline_defs(schema)
 
 
+class TestPrepareSchema:
+    """Test single-pass schema preparation"""
+
+    def test_matches_separate_passes(self):
+        """Test result equals inline_defs followed by add_additional_properties_false"""
+        schema = {
+            "title": "Root",
+            "type": "object",
+            "properties": {
+                "user": {"$ref": "#/$defs/User"},
+                "tags": {"type": "array", "items": {"type": "string"}}
+            },
+            "$defs": {
+                "User": {
+                    "title": "User",
+                    "type": "object",
+                    "properties": {
+                        "name": {"type": "string", "description": "User name"}
+                    }
+                }
+            }
+        }
+
+        result = prepare_schema(schema)
+
+        assert result == add_additional_properties_false(inline_defs(schema))
+        assert "$defs" in schema  # Input is not modified
+
+    def test_objects_inside_lists(self):
+        """Test additionalProperties: false is added to objects in anyOf branches"""
+        schema = {
+            "type": "object",
+            "properties": {
+                "value": {
+                    "anyOf": [
+                        {"type": "object", "properties": {"x": {"type": "integer"}}},
+                        {"type": "null"}
+                    ]
+                }
+            }
+        }
+
+        result = prepare_schema(schema)
+
+        assert result["properties"]["value"]["anyOf"][0]["additionalProperties"] is False
+        assert "additionalProperties" not in result["properties"]["value"]["anyOf"][1]
+        assert result == add_additional_properties_false(inline_defs(schema))
+
+    def test_property_named_title(self):
+        """Test a property called "title" is kept, as in inline_defs"""
+        schema = {
+            "type": "object",
+            "title": "Article",
+            "properties": {"title": {"type": "string", "title": "Title"}},
+            "required": ["title"]
+        }
+
+        result = prepare_schema(schema)
+
+        assert result["properties"] == {"title": {"type": "string"}}
+        assert result == add_additional_properties_false(inline_defs(schema))
+
+    def test_circular_references(self):
+        """Test circular references raise ValueError"""
+        schema = {
+            "type": "object",
+            "properties": {"node": {"$ref": "#/$defs/Node"}},
+            "$defs": {
+                "Node": {
+                    "type": "object",
+                    "properties": {"child": {"$ref": "#/$defs/Node"}}
+                }
+            }
+        }
+
+        with pytest.raises(ValueError, match="Circular reference detected in schema: Node"):
+            prepare_schema(schema)
+
+
+class TestDeepSchemas:
+    """Test schema utilities on nesting deeper than the recursion limit"""
+
+    @staticmethod
+    def _deep_schema(depth):
+        schema = {"type": "string", "description": "Leaf"}
+        for _ in range(depth):
+            schema = {"type": "object", "title": "Node", "properties": {"child": schema}}
+        return schema
+
+    def test_deep_nesting_does_not_recurse(self):
+        """Test traversal is iterative and handles very deep schemas"""
+        depth = 5000
+        schema = self._deep_schema(depth)
+
+        added = add_additional_properties_false(schema)
+        inlined = inline_defs(schema)
+        prepared = prepare_schema(schema)
+
+        assert extract_descriptions(schema) == {"child": "Leaf"}
+        for result in (added, prepared):
+            node = result
+            for _ in range(depth):
+                assert node["additionalProperties"] is False
+                node = node["properties"]["child"]
+            assert node == {"type": "string", "description": "Leaf"}
+        assert "title" not in inlined and "title" in added
+
+    def test_wide_properties(self):
+        """Test flat objects with many independent property subtrees"""
+        schema = {
+            "type": "object",
+            "properties": {
+                f"field{i}": {"type": "object", "title": f"F{i}", "description": f"Field {i}",
+                              "properties": {"value": {"type": "integer"}}}
+                for i in range(500)
+            },
+        }
+
+        added = add_additional_properties_false(schema)
+        prepared = prepare_schema(schema)
+        descriptions = extract_descriptions(schema)
+
+        assert list(added["properties"]) == list(schema["properties"])
+        for result in (added, prepared):
+            assert result["additionalProperties"] is False
+            assert all(prop["additionalProperties"] is False for prop in result["properties"].values())
+        assert len(descriptions) == 500
+        assert "additionalProperties" not in schema["properties"]["field0"]